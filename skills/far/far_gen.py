@@ -1,15 +1,32 @@
 #!/usr/bin/env python3
+import io
+import itertools
 import os
+import re
 import sys
+import time
+import fnmatch
+import functools
 import argparse
 import hashlib
+import mmap
+import threading
+import concurrent.futures
 import mimetypes
+import shutil
 import subprocess
+import tempfile
+import csv
 import datetime
+import email
+import sqlite3
+import tarfile
 import zipfile
 import xml.etree.ElementTree as ET
+import http.client
 import urllib.request
 import urllib.error
+import urllib.parse
 import json
 import base64
 from pathlib import Path
@@ -23,65 +40,369 @@ FFPROBE_BIN = "/home/linuxbrew/.linuxbrew/bin/ffprobe"
 OPENAI_MODEL_AUDIO = "whisper-1"
 OPENAI_MODEL_IMAGE = "gpt-4o-mini" # Use a cost-effective model for vision
 MAX_AUDIO_MB = 25 # OpenAI API limit
+API_MAX_CONCURRENCY = int(os.environ.get("FAR_API_CONCURRENCY", "8")) # Parallel OpenAI requests
+API_RETRIES = 3 # Attempts per request (429/5xx backoff)
 LOG_FILE = os.path.expanduser("~/far.log")
 
+_LOG_LOCK = threading.Lock()
+
 def log(msg, level="INFO"):
     timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     formatted_msg = f"[{timestamp}] [{level}] {msg}"
-    print(formatted_msg)
-    try:
-        with open(LOG_FILE, "a") as f:
-            f.write(formatted_msg + "\n")
-    except: pass
+    # Extraction workers log concurrently; serialize so lines don't interleave
+    with _LOG_LOCK:
+        print(formatted_msg)
+        try:
+            with open(LOG_FILE, "a") as f:
+                f.write(formatted_msg + "\n")
+        except: pass
+
+@functools.lru_cache(maxsize=None)
+def parse_env(env_path, mtime):
+    """Parse a .env file in one read; cached per (path, mtime)."""
+    env = {}
+    with open(env_path, 'r') as f:
+        for line in f.read().splitlines():
+            line = line.strip()
+            if not line or line.startswith('#'): continue
+            if '=' in line:
+                key, value = line.split('=', 1)
+                # Strip quotes if present
+                value = value.strip().strip("'").strip('"')
+                env[key.strip()] = value
+    return env
 
 def load_env(env_path):
-    """Simple .env parser to avoid external dependencies."""
-    if os.path.exists(env_path):
-        with open(env_path, 'r') as f:
-            for line in f:
-                line = line.strip()
-                if not line or line.startswith('#'): continue
-                if '=' in line:
-                    key, value = line.split('=', 1)
-                    # Strip quotes if present
-                    value = value.strip().strip("'").strip('"')
-                    os.environ[key.strip()] = value
+    """Simple .env parser to avoid external dependencies.
+
+    Repeat loads of an unchanged file (re-imports, worker startup) hit the
+    parse cache instead of re-reading disk.
+    """
+    try:
+        mtime = os.stat(env_path).st_mtime
+    except OSError:
+        return
+    os.environ.update(parse_env(env_path, mtime))
 
 # Load .env from skill directory or user home
 SCRIPT_DIR = os.path.dirname(os.path.realpath(__file__))
 load_env(os.path.join(SCRIPT_DIR, ".env"))
 load_env(os.path.expanduser("~/.far.env"))
 
+# Cached: called for every media file, and load_env has already populated
+# os.environ by the time the first API path runs.
+@functools.lru_cache(maxsize=1)
 def get_openai_key():
     return os.environ.get("OPENAI_API_KEY")
 
+@functools.lru_cache(maxsize=1)
 def get_openai_base():
     return os.environ.get("OPENAI_BASE_URL", "https://api.openai.com/v1")
 
+HASH_BLOCK_SIZE = 1024 * 1024  # 1 MiB blocks; 4 KiB reads were syscall-bound
+STATE_DB_FILE = os.path.expanduser("~/.far_state.db")
+
+# FAR only needs a change-detection fingerprint, not a security property.
+# SHA-256 stays the default (hardware SHA-NI makes it fast, and the .meta
+# format documents it), but machines without SHA extensions can opt into
+# e.g. blake2b via FAR_HASH_ALGO.
+HASH_ALGO = os.environ.get("FAR_HASH_ALGO", "sha256")
+
+def new_hasher():
+    if HASH_ALGO.startswith('blake2'):
+        # 128 bits is plenty for a change-detection key and halves the
+        # stored/compared hex length.
+        return hashlib.new(HASH_ALGO, digest_size=16)
+    return hashlib.new(HASH_ALGO)
+
+def hash_field(digest):
+    """Frontmatter line for a content fingerprint, tagged when non-default."""
+    if HASH_ALGO == "sha256":
+        return f"sha256: {digest}"
+    return f"content_hash: {HASH_ALGO}:{digest}"
+
+class StateDB:
+    """Persistent (path, mtime, size) -> sha256 cache.
+
+    Unchanged files keep their stat tuple between scans, so the hash can be
+    reused instead of re-reading the whole file (e.g. on --force or when the
+    .meta sidecar is missing). Degrades to a no-op if the DB can't be opened.
+    """
+    def __init__(self, db_path=STATE_DB_FILE):
+        self.con = None
+        self.lock = threading.Lock()
+        try:
+            self.con = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+            self.con.execute("PRAGMA journal_mode=WAL")
+            self.con.execute("PRAGMA synchronous=NORMAL")
+            self.con.execute("CREATE TABLE IF NOT EXISTS hashes (path TEXT, algo TEXT, mtime REAL, size INTEGER, digest TEXT, PRIMARY KEY (path, algo))")
+            self.con.execute("CREATE TABLE IF NOT EXISTS vision (digest TEXT PRIMARY KEY, description TEXT)")
+        except Exception:
+            self.con = None
+
+    def get(self, path, mtime, size):
+        if not self.con: return None
+        try:
+            with self.lock:
+                row = self.con.execute(
+                    "SELECT digest FROM hashes WHERE path=? AND algo=? AND mtime=? AND size=?",
+                    (path, HASH_ALGO, mtime, size)).fetchone()
+            return row[0] if row else None
+        except Exception:
+            return None
+
+    def put(self, path, mtime, size, digest):
+        if not self.con: return
+        try:
+            with self.lock:
+                self.con.execute(
+                    "INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?)",
+                    (path, HASH_ALGO, mtime, size, digest))
+        except Exception:
+            pass
+
+    def get_vision(self, digest):
+        if not self.con: return None
+        try:
+            with self.lock:
+                row = self.con.execute(
+                    "SELECT description FROM vision WHERE digest=?", (digest,)).fetchone()
+            return row[0] if row else None
+        except Exception:
+            return None
+
+    def put_vision(self, digest, description):
+        if not self.con: return
+        try:
+            with self.lock:
+                self.con.execute(
+                    "INSERT OR REPLACE INTO vision VALUES (?, ?)", (digest, description))
+        except Exception:
+            pass
+
+_STATE_DB = None
+
+def get_state_db():
+    global _STATE_DB
+    if _STATE_DB is None:
+        _STATE_DB = StateDB()
+    return _STATE_DB
+
 def get_sha256(filepath):
-    """Calculate SHA256 checksum of a file."""
-    sha256_hash = hashlib.sha256()
+    """Calculate the content fingerprint of a file (cached by stat tuple in
+    StateDB). SHA-256 by default; see HASH_ALGO."""
+    sha256_hash = new_hasher()
+    key = os.path.abspath(filepath)
+    db = get_state_db()
     try:
         with open(filepath, "rb") as f:
-            for byte_block in iter(lambda: f.read(4096), b""):
-                sha256_hash.update(byte_block)
-        return sha256_hash.hexdigest()
+            st = os.fstat(f.fileno())
+            size = st.st_size
+            cached = db.get(key, st.st_mtime, size)
+            if cached:
+                return cached
+            if size >= HASH_BLOCK_SIZE:
+                # mmap lets OpenSSL hash straight out of the page cache,
+                # no per-block copies into Python bytes objects.
+                try:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                        if hasattr(mm, 'madvise'):
+                            mm.madvise(mmap.MADV_SEQUENTIAL)
+                        sha256_hash.update(mm)
+                    digest = sha256_hash.hexdigest()
+                    db.put(key, st.st_mtime, size, digest)
+                    return digest
+                except (ValueError, OSError):
+                    # e.g. no mmap support on the filesystem, or ENOMEM for
+                    # huge maps on 32-bit hosts; restart cleanly on the read
+                    # loop in case the mapping died mid-update.
+                    sha256_hash = new_hasher()
+                    f.seek(0)
+            if hasattr(hashlib, 'file_digest'):
+                # 3.11+: the whole read/update loop runs in C
+                sha256_hash = hashlib.file_digest(f, new_hasher)
+            else:
+                for byte_block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+                    sha256_hash.update(byte_block)
+        digest = sha256_hash.hexdigest()
+        db.put(key, st.st_mtime, size, digest)
+        return digest
     except (PermissionError, FileNotFoundError):
         return None
 
+@functools.lru_cache(maxsize=None)
+def tool_path(name):
+    """Resolve an external tool once per run (brew pin first, then PATH).
+
+    Callers used to re-probe availability per file (os.path.exists, `--version`
+    runs); memoizing makes the check free after the first file.
+    """
+    pinned = {'ffmpeg': FFMPEG_BIN, 'ffprobe': FFPROBE_BIN}.get(name)
+    if pinned and os.path.exists(pinned):
+        return pinned
+    return shutil.which(name)
+
+_MIME_CACHE = {}
+
+# First-bytes signatures for the formats the extractors dispatch on; checked
+# before forking `file` so an unknown extension usually costs one 16-byte read.
+MAGIC_SIGNATURES = [
+    (b'%PDF', 'application/pdf'),
+    (b'PK\x03\x04', 'application/zip'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF8', 'image/gif'),
+    (b'ID3', 'audio/mpeg'),
+    (b'OggS', 'audio/ogg'),
+    (b'fLaC', 'audio/flac'),
+    (b'SQLite format 3\x00', 'application/vnd.sqlite3'),
+    (b'\x1f\x8b', 'application/gzip'),
+    (b'{\\rtf', 'application/rtf'),
+]
+
+def sniff_mime(filepath):
+    """MIME type from the first 16 bytes, or None if no signature matches."""
+    try:
+        with open(filepath, 'rb') as f:
+            head = f.read(16)
+    except OSError:
+        return None
+    for sig, mime in MAGIC_SIGNATURES:
+        if head.startswith(sig):
+            return mime
+    if head.startswith(b'RIFF'):  # container: format tag sits at offset 8
+        if head[8:12] == b'WAVE':
+            return 'audio/x-wav'
+        if head[8:12] == b'AVI ':
+            return 'video/x-msvideo'
+    if head[4:8] == b'ftyp':
+        return 'video/mp4'
+    return None
+
 def get_mime_type(filepath):
-    """Guess MIME type."""
-    mime_type, _ = mimetypes.guess_type(filepath)
+    """Guess MIME type, cached per extension.
+
+    get_mime_type runs several times per file (transcribe, meta generation),
+    and unknown extensions used to fork `file --mime-type` every call; on big
+    trees those forks dominate. One lookup per distinct extension is enough.
+    """
+    ext = os.path.splitext(filepath)[1].lower()
+    if ext in _MIME_CACHE:
+        return _MIME_CACHE[ext]
+    mime_type, encoding = mimetypes.guess_type(filepath)
+    if mime_type is None:
+        mime_type = sniff_mime(filepath)
     if mime_type is None:
         try:
             result = subprocess.run(['file', '--mime-type', '-b', filepath], capture_output=True, text=True)
-            mime_type = result.stdout.strip()
+            mime_type = result.stdout.strip() or "application/octet-stream"
         except FileNotFoundError:
             mime_type = "application/octet-stream"
+    # Extensionless files are content-sniffed and can differ per file, and
+    # encoding suffixes like .gz depend on the inner name — don't cache those.
+    if ext and encoding is None:
+        _MIME_CACHE[ext] = mime_type
     return mime_type
 
 # --- AI Extractors (Zero Dependency HTTP) ---
 
+class MultipartUpload:
+    """File-like multipart/form-data body that streams the payload file from
+    disk in chunks instead of concatenating it into one in-memory buffer."""
+    def __init__(self, prefix, filepath, suffix):
+        self._streams = [io.BytesIO(prefix), open(filepath, 'rb'), io.BytesIO(suffix)]
+        self._idx = 0
+        self._length = len(prefix) + os.path.getsize(filepath) + len(suffix)
+
+    def __len__(self):
+        return self._length
+
+    def read(self, n=-1):
+        if n is None or n < 0:
+            return b''.join(iter(lambda: self.read(64 * 1024), b''))
+        while self._idx < len(self._streams):
+            chunk = self._streams[self._idx].read(n)
+            if chunk:
+                return chunk
+            self._streams[self._idx].close()
+            self._idx += 1
+        return b''
+
+# One keep-alive connection per (scheme, host) per thread: every worker
+# thread reuses its TLS session across calls instead of paying the handshake
+# on each request.
+_CONN_LOCAL = threading.local()
+
+def _http_request(method, url, body, headers):
+    """Send one request over a per-thread keep-alive connection.
+
+    Returns the raw response body. Raises urllib.error.HTTPError on non-2xx
+    and urllib.error.URLError on transport failure, so callers handle errors
+    exactly as they did with urlopen. A stale keep-alive socket gets one
+    transparent retry on a fresh connection when the body is rewindable.
+    """
+    parts = urllib.parse.urlsplit(url)
+    conns = getattr(_CONN_LOCAL, 'conns', None)
+    if conns is None:
+        conns = _CONN_LOCAL.conns = {}
+    key = (parts.scheme, parts.netloc)
+    path = parts.path + (f'?{parts.query}' if parts.query else '')
+    rewindable = body is None or isinstance(body, (bytes, bytearray))
+    for fresh in (False, True):
+        conn = conns.get(key)
+        if conn is None:
+            conn_cls = (http.client.HTTPSConnection if parts.scheme == 'https'
+                        else http.client.HTTPConnection)
+            conn = conns[key] = conn_cls(parts.netloc, timeout=300)
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            resp = conn.getresponse()
+            payload = resp.read()
+        except (http.client.HTTPException, OSError) as e:
+            conns.pop(key, None)
+            conn.close()
+            # A streamed body may be partially consumed; let the caller
+            # rebuild it rather than resending a dirty stream.
+            if fresh or not rewindable:
+                raise urllib.error.URLError(e)
+            continue
+        if resp.status >= 400:
+            raise urllib.error.HTTPError(url, resp.status, resp.reason,
+                                         resp.headers, io.BytesIO(payload))
+        return payload
+
+def openai_request(url, data, headers):
+    """POST to the OpenAI API with retry + exponential backoff on 429/5xx.
+
+    `data` may be bytes or a zero-arg callable producing the request body, so
+    streaming bodies can be rebuilt for each retry attempt.
+    """
+    last_error = None
+    for attempt in range(API_RETRIES):
+        body = data() if callable(data) else data
+        send_headers = dict(headers)
+        if not isinstance(body, (bytes, bytearray)) and hasattr(body, '__len__'):
+            # http.client only derives Content-Length for buffer-like bodies
+            send_headers['Content-Length'] = str(len(body))
+        try:
+            return json.loads(_http_request('POST', url, body, send_headers))
+        except urllib.error.HTTPError as e:
+            if e.code != 429 and e.code < 500:
+                raise
+            last_error = e
+        except urllib.error.URLError as e:
+            last_error = e
+        time.sleep(2 ** attempt)
+    raise last_error
+
+def openai_map(func, items):
+    """Run one OpenAI-backed call per item concurrently (the work is I/O-bound,
+    so a bounded thread pool overlaps the HTTP round-trips)."""
+    if len(items) <= 1:
+        return [func(item) for item in items]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=API_MAX_CONCURRENCY) as pool:
+        return list(pool.map(func, items))
+
 def openai_transcribe(filepath):
     """Transcribe audio/video using OpenAI Whisper API via standard library."""
     api_key = get_openai_key()
@@ -97,7 +418,7 @@ def openai_transcribe(filepath):
     if file_size_mb > MAX_AUDIO_MB or get_mime_type(filepath).startswith('video/'):
         # Extract/Compress audio
         temp_audio = filepath + ".far_temp.mp3"
-        ffmpeg_cmd = [FFMPEG_BIN if os.path.exists(FFMPEG_BIN) else 'ffmpeg', '-y', '-i', filepath, '-vn', '-ar', '16000', '-ac', '1', '-b:a', '32k', temp_audio]
+        ffmpeg_cmd = [tool_path('ffmpeg') or 'ffmpeg', '-y', '-i', filepath, '-vn', '-ar', '16000', '-ac', '1', '-b:a', '32k', temp_audio]
         try:
             subprocess.run(ffmpeg_cmd, check=True, capture_output=True)
             process_file = temp_audio
@@ -122,24 +443,21 @@ def openai_transcribe(filepath):
         data.append(f'Content-Disposition: form-data; name="file"; filename="{os.path.basename(process_file)}"')
         data.append('Content-Type: application/octet-stream')
         data.append('')
-        
-        with open(process_file, 'rb') as f:
-            file_data = f.read()
-            
-        body = b'\r\n'.join([x.encode('utf-8') for x in data]) + b'\r\n' + file_data + b'\r\n' + f'--{boundary}--'.encode('utf-8') + b'\r\n'
 
-        req = urllib.request.Request(
+        # Stream the audio from disk: a 25 MB blob would otherwise be read,
+        # joined and copied (>50 MB peak) before the upload even starts.
+        prefix = b'\r\n'.join([x.encode('utf-8') for x in data]) + b'\r\n'
+        suffix = b'\r\n' + f'--{boundary}--'.encode('utf-8') + b'\r\n'
+
+        result = openai_request(
             f"{get_openai_base()}/audio/transcriptions",
-            data=body,
+            data=lambda: MultipartUpload(prefix, process_file, suffix),
             headers={
                 'Authorization': f'Bearer {api_key}',
                 'Content-Type': f'multipart/form-data; boundary={boundary}'
             }
         )
-        
-        with urllib.request.urlopen(req) as response:
-            result = json.load(response)
-            return f"[AI Transcription ({OPENAI_MODEL_AUDIO})]:\n{result.get('text', '')}"
+        return f"[AI Transcription ({OPENAI_MODEL_AUDIO})]:\n{result.get('text', '')}"
 
     except Exception as e:
         return f"[AI Transcription Error: {e}]"
@@ -147,90 +465,490 @@ def openai_transcribe(filepath):
         if temp_audio and os.path.exists(temp_audio):
             os.remove(temp_audio)
 
+VISION_MAX_EDGE = 1024  # px; plenty for a low-detail description
+VISION_DOWNSCALE_MIN_BYTES = 200 * 1024  # don't bother re-encoding small images
+
+def b64encode_file(filepath):
+    """Base64-encode a file in chunks.
+
+    Encoding chunk by chunk means the raw bytes and the encoded copy never
+    coexist in full — peak memory is the encoded string plus one chunk,
+    instead of ~2.3x the file size.
+    """
+    parts = []
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(48 * 1024), b''):  # multiple of 3
+            parts.append(base64.b64encode(chunk).decode('ascii'))
+    return ''.join(parts)
+
+def prepare_vision_image(filepath):
+    """Base64 payload for the Vision API, downscaled when worthwhile.
+
+    Full-resolution payloads are the Raw Vision Payload anti-pattern: a 10 MB
+    photo base64-inflates to ~13 MB of upload for a description the model
+    could produce from a 1024px JPEG. When ffmpeg is available and the file
+    is big enough to matter, re-encode to fit 1024px at JPEG ~q80; otherwise
+    stream-encode the original bytes. Returns (base64 str, data-URL subtype).
+    """
+    subtype = 'png' if filepath.lower().endswith('.png') else 'jpeg'
+    try:
+        if os.path.getsize(filepath) >= VISION_DOWNSCALE_MIN_BYTES:
+            ffmpeg = tool_path('ffmpeg')
+            if ffmpeg:
+                scale = (f"scale=min({VISION_MAX_EDGE}\\,iw):min({VISION_MAX_EDGE}\\,ih)"
+                         ":force_original_aspect_ratio=decrease")
+                r = subprocess.run(
+                    [ffmpeg, '-v', 'error', '-i', filepath, '-vf', scale,
+                     '-frames:v', '1', '-q:v', '4', '-f', 'mjpeg', '-'],
+                    capture_output=True)
+                if r.returncode == 0 and r.stdout:
+                    return base64.b64encode(r.stdout).decode('ascii'), 'jpeg'
+    except OSError:
+        pass
+    return b64encode_file(filepath), subtype
+
+def vision_payload(filepath):
+    """Build the chat/completions payload used for image description."""
+    base64_image, subtype = prepare_vision_image(filepath)
+    return {
+        "model": OPENAI_MODEL_IMAGE,
+        "messages": [
+            {
+            "role": "user",
+            "content": [
+                {"type": "text", "text": "Describe this image in detail for a blind user. If it contains text, transcribe it."},
+                # detail=low caps the image at a fixed 85-token budget; for a
+                # sidecar summary the full high-detail tiling is wasted spend.
+                {"type": "image_url", "image_url": {"url": f"data:image/{subtype};base64,{base64_image}", "detail": "low"}}
+            ]
+            }
+        ],
+        "max_tokens": 500
+    }
+
 def openai_vision(filepath):
     """Describe image using OpenAI Vision API."""
     api_key = get_openai_key()
     if not api_key: return None
-    
+
     # Simple check: skip large images to save bandwidth/tokens
     if os.path.getsize(filepath) > 10 * 1024 * 1024: return None
 
-    try:
-        with open(filepath, "rb") as image_file:
-            base64_image = base64.b64encode(image_file.read()).decode('utf-8')
+    # Duplicate images (repeated logos, headers, figures across a tree) get
+    # the cached description instead of a second paid vision call.
+    digest = get_sha256(filepath)
+    if digest:
+        cached = get_state_db().get_vision(digest)
+        if cached:
+            return f"[AI Vision Description ({OPENAI_MODEL_IMAGE})]:\n{cached}"
 
+    try:
         headers = {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {api_key}"
         }
+        payload = vision_payload(filepath)
+
+        result = openai_request(
+            f"{get_openai_base()}/chat/completions",
+            data=json.dumps(payload).encode('utf-8'),
+            headers=headers
+        )
+        content = result['choices'][0]['message']['content']
+        if digest:
+            get_state_db().put_vision(digest, content)
+        return f"[AI Vision Description ({OPENAI_MODEL_IMAGE})]:\n{content}"
+
+    except Exception as e:
+        return f"[AI Vision Error: {e}]"
+
+
+def openai_vision_batch(filepaths):
+    """Describe several images with one Vision request instead of N.
+
+    Sends every (uncached, size-eligible) image as an image_url part of a
+    single message and asks for a JSON array of descriptions in input order —
+    one round-trip and one prefill for the whole set. Falls back to per-image
+    calls if the response doesn't parse. Returns results aligned with
+    `filepaths` (None where vision was skipped).
+    """
+    results = [None] * len(filepaths)
+    if not get_openai_key() or not filepaths:
+        return results
+    if len(filepaths) == 1:
+        return [openai_vision(filepaths[0])]
+
+    db = get_state_db()
+    pending = []
+    for i, filepath in enumerate(filepaths):
+        if os.path.getsize(filepath) > 10 * 1024 * 1024:
+            continue
+        digest = get_sha256(filepath)
+        cached = db.get_vision(digest) if digest else None
+        if cached:
+            results[i] = f"[AI Vision Description ({OPENAI_MODEL_IMAGE})]:\n{cached}"
+        else:
+            pending.append((i, filepath, digest))
+    if not pending:
+        return results
 
+    try:
+        content = [{"type": "text", "text":
+                    f"Describe each of the following {len(pending)} images in detail "
+                    "for a blind user; transcribe any text they contain. Respond with "
+                    f"only a JSON array of {len(pending)} strings, one description per "
+                    "image, in order."}]
+        for _, filepath, _ in pending:
+            base64_image, subtype = prepare_vision_image(filepath)
+            content.append({"type": "image_url", "image_url": {"url": f"data:image/{subtype};base64,{base64_image}", "detail": "low"}})
         payload = {
             "model": OPENAI_MODEL_IMAGE,
-            "messages": [
-                {
-                "role": "user",
-                "content": [
-                    {"type": "text", "text": "Describe this image in detail for a blind user. If it contains text, transcribe it."},
-                    {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}}
-                ]
-                }
-            ],
-            "max_tokens": 500
+            "messages": [{"role": "user", "content": content}],
+            "max_tokens": 500 * len(pending)
         }
-
-        req = urllib.request.Request(
+        result = openai_request(
             f"{get_openai_base()}/chat/completions",
             data=json.dumps(payload).encode('utf-8'),
-            headers=headers
+            headers={"Content-Type": "application/json", "Authorization": f"Bearer {get_openai_key()}"}
         )
+        text = result['choices'][0]['message']['content'].strip()
+        if text.startswith('```'):
+            text = text.strip('`').lstrip('json').strip()
+        descriptions = json.loads(text)
+        if not isinstance(descriptions, list) or len(descriptions) != len(pending):
+            raise ValueError("unexpected batch vision response shape")
+        for (i, filepath, digest), description in zip(pending, descriptions):
+            results[i] = f"[AI Vision Description ({OPENAI_MODEL_IMAGE})]:\n{description}"
+            if digest:
+                db.put_vision(digest, str(description))
+        return results
+    except Exception:
+        # Model didn't play along (or the request failed); fall back to
+        # concurrent per-image calls
+        fallback = openai_map(openai_vision, [p for _, p, _ in pending])
+        for (i, _, _), desc in zip(pending, fallback):
+            results[i] = desc
+        return results
+
+# --- Batch API (non-interactive bulk processing) ---
+
+BATCH_STATE_FILE = os.path.expanduser("~/.far_batches.json")
+
+def _load_batch_state():
+    try:
+        with open(BATCH_STATE_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+def _save_batch_state(state):
+    with open(BATCH_STATE_FILE, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2)
+
+def _openai_get(path):
+    """GET an OpenAI API endpoint, returning raw bytes."""
+    return _http_request(
+        'GET', f"{get_openai_base()}{path}", None,
+        {'Authorization': f'Bearer {get_openai_key()}'}
+    )
+
+# Batch API limits: 50k requests per batch, 200 MB per input file.
+# Stay under both and split oversized workloads into several jobs.
+BATCH_MAX_REQUESTS = 50000
+BATCH_MAX_BYTES = 100 * 1024 * 1024
+
+def _submit_one_batch(lines, file_map):
+    """Upload one JSONL chunk and create its batch job."""
+    boundary = '----WebKitFormBoundary7MA4YWxkTrZu0gW'
+    jsonl_data = "\n".join(lines).encode('utf-8')
+    body_parts = [
+        f'--{boundary}',
+        'Content-Disposition: form-data; name="purpose"',
+        '',
+        'batch',
+        f'--{boundary}',
+        'Content-Disposition: form-data; name="file"; filename="far_batch.jsonl"',
+        'Content-Type: application/jsonl',
+        '',
+    ]
+    body = b'\r\n'.join([x.encode('utf-8') for x in body_parts]) + b'\r\n' + jsonl_data + b'\r\n' + f'--{boundary}--'.encode('utf-8') + b'\r\n'
 
-        with urllib.request.urlopen(req) as response:
-            result = json.load(response)
-            content = result['choices'][0]['message']['content']
-            return f"[AI Vision Description ({OPENAI_MODEL_IMAGE})]:\n{content}"
-
+    try:
+        uploaded = openai_request(
+            f"{get_openai_base()}/files",
+            data=body,
+            headers={
+                'Authorization': f'Bearer {get_openai_key()}',
+                'Content-Type': f'multipart/form-data; boundary={boundary}'
+            }
+        )
+        batch = openai_request(
+            f"{get_openai_base()}/batches",
+            data=json.dumps({
+                "input_file_id": uploaded['id'],
+                "endpoint": "/v1/chat/completions",
+                "completion_window": "24h"
+            }).encode('utf-8'),
+            headers={
+                'Authorization': f'Bearer {get_openai_key()}',
+                'Content-Type': 'application/json'
+            }
+        )
     except Exception as e:
-        return f"[AI Vision Error: {e}]"
+        log(f"Batch submit failed: {e}", "ERROR")
+        return
+
+    state = _load_batch_state()
+    state[batch['id']] = {
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "files": file_map
+    }
+    _save_batch_state(state)
+    log(f"Batch submitted: {batch['id']} ({len(file_map)} images). Collect later with --collect-batches")
+
+def submit_batch(target_path, ignore_patterns, force=False):
+    """Phase 1 of --batch: queue all pending Vision work as Batch API jobs.
+
+    Walks the tree, builds one JSONL request line per image (same payload as
+    openai_vision), uploads it with purpose=batch and creates a batch against
+    /v1/chat/completions. Half the per-token cost, up to 24h turnaround —
+    a good trade for a background indexer. The Batch API has no audio
+    endpoint, so transcription stays on the interactive path.
+    """
+    if not get_openai_key():
+        log("Error: --batch requires OPENAI_API_KEY", "ERROR")
+        return
 
+    lines = []
+    file_map = {}
+    pending_bytes = 0
+    total = 0
+    for root, dirs, files in os.walk(target_path):
+        if should_ignore(root, target_path, ignore_patterns): continue
+        for file in files:
+            if file.endswith('.meta') or file.startswith('.'): continue
+            file_path = os.path.join(root, file)
+            if should_ignore(file_path, target_path, ignore_patterns): continue
+            if not get_mime_type(file_path).startswith('image/'): continue
+            if os.path.getsize(file_path) > 10 * 1024 * 1024: continue
+            if not force and meta_is_current(file_path, file_path + ".meta"): continue
+            custom_id = f"far-{total}"
+            total += 1
+            file_map[custom_id] = file_path
+            line = json.dumps({
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": vision_payload(file_path)
+            })
+            lines.append(line)
+            pending_bytes += len(line) + 1
+            if len(lines) >= BATCH_MAX_REQUESTS or pending_bytes >= BATCH_MAX_BYTES:
+                _submit_one_batch(lines, file_map)
+                lines, file_map, pending_bytes = [], {}, 0
+
+    if lines:
+        _submit_one_batch(lines, file_map)
+    elif not total:
+        log("Batch: no pending images to submit")
+
+def collect_batches():
+    """Phase 2 of --batch: poll submitted batches and write completed .meta files."""
+    state = _load_batch_state()
+    if not state:
+        log("No pending batches")
+        return
+
+    remaining = {}
+    for batch_id, info in state.items():
+        try:
+            batch = json.loads(_openai_get(f"/batches/{batch_id}"))
+        except Exception as e:
+            log(f"Batch {batch_id}: poll failed ({e})", "ERROR")
+            remaining[batch_id] = info
+            continue
+        status = batch.get('status')
+        if status in ('failed', 'expired', 'cancelled'):
+            log(f"Batch {batch_id}: {status}, dropping", "ERROR")
+            continue
+        if status != 'completed':
+            log(f"Batch {batch_id}: {status}, try again later")
+            remaining[batch_id] = info
+            continue
+
+        try:
+            output = _openai_get(f"/files/{batch['output_file_id']}/content").decode('utf-8')
+        except Exception as e:
+            log(f"Batch {batch_id}: download failed ({e})", "ERROR")
+            remaining[batch_id] = info
+            continue
+
+        file_map = info.get('files', {})
+        written = 0
+        for line in output.splitlines():
+            if not line.strip(): continue
+            try:
+                entry = json.loads(line)
+                filepath = file_map.get(entry.get('custom_id'))
+                content = entry['response']['body']['choices'][0]['message']['content']
+            except Exception:
+                continue
+            if not filepath or not os.path.exists(filepath):
+                continue
+            ai_vision = f"[AI Vision Description ({OPENAI_MODEL_IMAGE})]:\n{content}"
+            local_ocr = local_image_ocr(filepath)
+            text = f"{local_ocr}\n\n{ai_vision}" if local_ocr else ai_vision
+            write_meta(filepath, text)
+            written += 1
+        log(f"Batch {batch_id}: wrote {written} .meta files")
+
+    _save_batch_state(remaining)
 
 # --- Local Extractors ---
 
+def tesseract_batch(images, lang='eng+chi_sim'):
+    """OCR several images with a single tesseract invocation.
+
+    tesseract accepts a text file listing input images and separates the
+    per-image output with form feeds, so N images cost one fork instead of N.
+    Returns stripped texts aligned with `images` ("" where OCR found nothing).
+    """
+    if not images or tool_path('tesseract') is None:
+        return ["" for _ in images]
+    try:
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as lf:
+            lf.write("\n".join(str(img) for img in images))
+            list_path = lf.name
+        try:
+            r = subprocess.run(['tesseract', list_path, '-', '-l', lang], capture_output=True, text=True)
+        finally:
+            os.remove(list_path)
+        if r.returncode != 0:
+            return ["" for _ in images]
+        texts = r.stdout.split('\f')
+        texts += [""] * (len(images) - len(texts))
+        return [t.strip() for t in texts[:len(images)]]
+    except FileNotFoundError:
+        return ["" for _ in images]
+
+def run_to_text(cmd):
+    """Run a command with stdout redirected to an unnamed temp file.
+
+    capture_output pumps stdout through a pipe in small reads and buffers
+    it all in Python; for converters that emit multi-MB text (pdftotext,
+    antiword, docx2txt) letting the kernel write straight to a file and
+    decoding it once is cheaper. Returns (returncode, stdout, stderr).
+    """
+    with tempfile.TemporaryFile() as tmp:
+        result = subprocess.run(cmd, stdout=tmp, stderr=subprocess.PIPE)
+        tmp.seek(0)
+        text = tmp.read().decode('utf-8', errors='ignore')
+    return result.returncode, text, result.stderr.decode('utf-8', errors='ignore')
+
+def pdf_page_count(filepath):
+    """Page count via pdfinfo; 0 if unavailable."""
+    if tool_path('pdfinfo') is None:
+        return 0
+    try:
+        r = subprocess.run(['pdfinfo', filepath], capture_output=True, text=True)
+        for line in r.stdout.splitlines():
+            if line.startswith('Pages:'):
+                return int(line.split()[1])
+    except (FileNotFoundError, ValueError, IndexError):
+        pass
+    return 0
+
+def ocr_pdf_page(filepath, page, lang='eng+chi_sim'):
+    """OCR one PDF page by piping the pdftoppm render straight into tesseract."""
+    render = subprocess.Popen(
+        ['pdftoppm', '-png', '-f', str(page), '-l', str(page), filepath, '-'],
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    try:
+        ocr = subprocess.run(['tesseract', 'stdin', 'stdout', '-l', lang],
+                             stdin=render.stdout, capture_output=True, text=True)
+    finally:
+        render.stdout.close()
+        render.wait()
+    return ocr.stdout.strip() if ocr.returncode == 0 else ""
+
+# Only PDFs at least this big/long go through chunked parallel extraction;
+# the pdfinfo fork and pool setup aren't worth it for typical documents.
+PDF_PARALLEL_MIN_BYTES = 5 * 1024 * 1024
+PDF_PARALLEL_MIN_PAGES = 50
+
+def pdftotext_pages(filepath, first, last):
+    """Text of a page range via pdftotext -f/-l; '' on failure."""
+    returncode, text, _ = run_to_text(
+        ['pdftotext', '-layout', '-f', str(first), '-l', str(last), filepath, '-'])
+    return text if returncode == 0 else ""
+
 def extract_pdf(filepath):
+    """Extract PDF text (+OCR/image fallback). Returns (text, layout)."""
+    layout = {}
     try:
-        result = subprocess.run(['pdftotext', '-layout', filepath, '-'], capture_output=True, text=True)
-        text = result.stdout
+        n_pages = 0
+        if os.path.getsize(filepath) >= PDF_PARALLEL_MIN_BYTES:
+            n_pages = pdf_page_count(filepath)
+        if n_pages >= PDF_PARALLEL_MIN_PAGES:
+            # One pdftotext process per page range: the native parsing of a
+            # single huge document overlaps across cores, which the per-file
+            # worker pool can't provide when one PDF dominates the run.
+            workers = min(8, os.cpu_count() or 4)
+            step = -(-n_pages // workers)
+            ranges = [(first, min(first + step - 1, n_pages))
+                      for first in range(1, n_pages + 1, step)]
+            with concurrent.futures.ThreadPoolExecutor(max_workers=len(ranges)) as pool:
+                chunks = list(pool.map(lambda r: pdftotext_pages(filepath, *r), ranges))
+            text = "".join(chunks)
+            returncode, stderr = (0, "") if any(chunks) else (1, "pdftotext failed")
+            layout['pages'] = n_pages
+        else:
+            returncode, text, stderr = run_to_text(['pdftotext', '-layout', filepath, '-'])
+            if returncode == 0 and text:
+                # pdftotext terminates every page with a form feed, so the
+                # page count comes free with the text — no pdfinfo fork.
+                layout['pages'] = text.count('\f')
 
         # Heuristic: If very little text, try OCR all pages
         if len(text.strip()) < 50:
-            try:
-                import tempfile
-                with tempfile.TemporaryDirectory() as tmpdir:
-                    subprocess.run(['pdftoppm', '-png', filepath, os.path.join(tmpdir, 'page')], capture_output=True)
-                    pages = sorted(Path(tmpdir).glob('*.png'))
-                    ocr_parts = []
-                    for i, page in enumerate(pages, 1):
-                        r = subprocess.run(['tesseract', str(page), '-', '-l', 'eng+chi_sim'], capture_output=True, text=True)
-                        if r.returncode == 0 and r.stdout.strip():
-                            ocr_parts.append(f"[Page {i}]:\n{r.stdout.strip()}")
-                    if ocr_parts:
-                        text = f"{text}\n\n[OCR Extraction]:\n" + "\n\n".join(ocr_parts)
-            except FileNotFoundError:
-                pass
+            ocr_texts = []
+            n_pages = n_pages or pdf_page_count(filepath)
+            if n_pages:
+                layout['pages'] = n_pages
+            if n_pages and tool_path('pdftoppm') and tool_path('tesseract'):
+                # Render each page to a pipe and OCR it in place: no temp
+                # PNGs, and pages OCR in parallel across cores (tesseract
+                # is single-threaded per image).
+                workers = min(n_pages, os.cpu_count() or 4)
+                with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+                    ocr_texts = list(pool.map(
+                        lambda p: ocr_pdf_page(filepath, p),
+                        range(1, n_pages + 1)))
+            else:
+                try:
+                    with tempfile.TemporaryDirectory() as tmpdir:
+                        subprocess.run(['pdftoppm', '-png', filepath, os.path.join(tmpdir, 'page')], capture_output=True)
+                        pages = sorted(Path(tmpdir).glob('*.png'))
+                        ocr_texts = tesseract_batch(pages)
+                except FileNotFoundError:
+                    pass
+            ocr_parts = [f"[Page {i}]:\n{t}" for i, t in enumerate(ocr_texts, 1) if t]
+            if ocr_parts:
+                text = f"{text}\n\n[OCR Extraction]:\n" + "\n\n".join(ocr_parts)
 
         # Extract embedded images from PDF
         images_text = extract_pdf_images(filepath)
         if images_text:
             text = f"{text}\n\n{images_text}"
 
-        return text if result.returncode == 0 else f"[Error: {result.stderr}]"
+        return (text if returncode == 0 else f"[Error: {stderr}]"), layout
     except FileNotFoundError:
-        return "[Error: pdftotext not installed]"
+        return "[Error: pdftotext not installed]", layout
 
 
 def extract_pdf_images(filepath):
     """Extract and OCR embedded images from a PDF using pdfimages."""
     try:
-        import tempfile
         with tempfile.TemporaryDirectory() as tmpdir:
             result = subprocess.run(
                 ['pdfimages', '-png', filepath, os.path.join(tmpdir, 'img')],
@@ -242,15 +960,12 @@ def extract_pdf_images(filepath):
             if not images:
                 return ""
             parts = ["## Embedded Images"]
-            for i, img in enumerate(images[:10], 1):  # cap at 10 images
-                ocr = ""
-                try:
-                    r = subprocess.run(['tesseract', str(img), '-', '-l', 'eng+chi_sim'], capture_output=True, text=True)
-                    if r.returncode == 0 and r.stdout.strip():
-                        ocr = r.stdout.strip()
-                except FileNotFoundError:
-                    pass
-                ai = openai_vision(str(img))
+            images = images[:10]  # cap at 10 images
+            ocr_results = tesseract_batch(images)
+            ai_results = openai_vision_batch([str(img) for img in images])
+            for i, img in enumerate(images, 1):
+                ocr = ocr_results[i - 1]
+                ai = ai_results[i - 1]
                 if ai or ocr:
                     parts.append(f"### Image {i}")
                     if ai:
@@ -263,74 +978,91 @@ def extract_pdf_images(filepath):
 
 def extract_docx(filepath):
     try:
-        result = subprocess.run(['docx2txt', filepath, '-'], capture_output=True, text=True)
-        return result.stdout if result.returncode == 0 else f"[Error: {result.stderr}]"
+        returncode, text, stderr = run_to_text(['docx2txt', filepath, '-'])
+        return text if returncode == 0 else f"[Error: {stderr}]"
     except FileNotFoundError:
         return "[Error: docx2txt not installed]"
 
 def extract_doc(filepath):
     try:
-        result = subprocess.run(['antiword', filepath], capture_output=True, text=True)
-        return result.stdout if result.returncode == 0 else f"[Error: {result.stderr}]"
+        returncode, text, stderr = run_to_text(['antiword', filepath])
+        return text if returncode == 0 else f"[Error: {stderr}]"
     except FileNotFoundError:
         return "[Error: antiword not installed]"
 
+# SpreadsheetML qualified tags: direct equality against these is a C-level
+# string compare per element, and cannot false-match same-named tags from
+# other schemas the way a suffix check would.
+SPREADSHEETML_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+SHEET_T = SPREADSHEETML_NS + 't'
+SHEET_ROW = SPREADSHEETML_NS + 'row'
+SHEET_CELL = SPREADSHEETML_NS + 'c'
+SHEET_V = SPREADSHEETML_NS + 'v'
+
 def extract_xlsx(filepath):
+    """Extract sheet text from an XLSX workbook. Returns (text, layout)."""
     text_content = []
     try:
         with zipfile.ZipFile(filepath, 'r') as z:
             shared_strings = []
             if 'xl/sharedStrings.xml' in z.namelist():
                 with z.open('xl/sharedStrings.xml') as f:
-                    tree = ET.parse(f)
-                    root = tree.getroot()
-                    for t in root.iter():
-                        if t.tag.endswith('t'): 
-                            if t.text:
-                                shared_strings.append(t.text)
-            
+                    # iterparse streams the XML; no full DOM for big string tables
+                    for _, elem in ET.iterparse(io.BufferedReader(f, buffer_size=1 << 20)):
+                        if elem.tag == SHEET_T:
+                            if elem.text:
+                                shared_strings.append(elem.text)
+                        elem.clear()
+
             sheet_files = [f for f in z.namelist() if f.startswith('xl/worksheets/sheet') and f.endswith('.xml')]
             sheet_files.sort()
-            
+
             for file in sheet_files:
                 sheet_name = file.split('/')[-1]
                 text_content.append(f"## {sheet_name}")
-                
+
                 with z.open(file) as f:
-                    tree = ET.parse(f)
-                    root = tree.getroot()
                     rows = []
-                    for row in root.iter():
-                        if row.tag.endswith('row'):
-                            row_data = []
-                            for cell in row.iter():
-                                if cell.tag.endswith('c'):
-                                    cell_type = cell.get('t')
-                                    val = None
-                                    for v in cell.iter():
-                                        if v.tag.endswith('v'):
-                                            val = v.text
-                                            break
-                                    if val:
-                                        if cell_type == 's': 
-                                            try:
-                                                idx = int(val)
-                                                if idx < len(shared_strings):
-                                                    val = shared_strings[idx]
-                                            except ValueError: pass
-                                        row_data.append(str(val))
-                            if row_data:
-                                rows.append(" | ".join(row_data))
+                    # Stream row by row, clearing each processed row so a
+                    # 50k-row sheet never holds more than one row of cells.
+                    for _, elem in ET.iterparse(io.BufferedReader(f, buffer_size=1 << 20)):
+                        if elem.tag != SHEET_ROW:
+                            continue
+                        row_data = []
+                        # <c> is always a direct child of <row> and <v> of
+                        # <c>; walking children beats full .iter() descents
+                        for cell in elem:
+                            if cell.tag != SHEET_CELL:
+                                continue
+                            cell_type = cell.get('t')
+                            v = cell.find(SHEET_V)
+                            val = v.text if v is not None else None
+                            if val:
+                                if cell_type == 's':
+                                    try:
+                                        idx = int(val)
+                                        if idx < len(shared_strings):
+                                            val = shared_strings[idx]
+                                    except ValueError: pass
+                                row_data.append(str(val))
+                        if row_data:
+                            rows.append(" | ".join(row_data))
+                        elem.clear()
                     if rows:
                         text_content.append("\n".join(rows))
                     else:
                         text_content.append("(Empty Sheet)")
                     text_content.append("\n")
-        return "\n".join(text_content)
+        return "\n".join(text_content), {'sheets': len(sheet_files)}
     except Exception as e:
-        return f"[Error extracting XLSX (native mode): {e}]"
+        return f"[Error extracting XLSX (native mode): {e}]", {}
+
+# Text runs in PPTX are always DrawingML <a:t>; matching the qualified tag
+# exactly avoids picking up unrelated 't'-named elements from other schemas.
+DRAWINGML_T = '{http://schemas.openxmlformats.org/drawingml/2006/main}t'
 
 def extract_pptx(filepath):
+    """Extract slide text from a PPTX deck. Returns (text, layout)."""
     text_content = []
     try:
         with zipfile.ZipFile(filepath, 'r') as z:
@@ -341,29 +1073,39 @@ def extract_pptx(filepath):
                 text_content.append(f"## Slide {i+1}")
                 slide_text = []
                 with z.open(slide) as f:
-                    tree = ET.parse(f)
-                    root = tree.getroot()
-                    for elem in root.iter():
-                        if elem.tag.endswith('t'):
-                            if elem.text:
-                                slide_text.append(elem.text)
+                    for _, elem in ET.iterparse(io.BufferedReader(f, buffer_size=1 << 20)):
+                        if elem.tag == DRAWINGML_T and elem.text:
+                            slide_text.append(elem.text)
+                        elem.clear()
                 if slide_text:
                     text_content.append("\n".join(slide_text))
                 else:
                     text_content.append("(No text)")
                 text_content.append("\n")
-        return "\n".join(text_content)
+        return "\n".join(text_content), {'slides': len(slides)}
     except Exception as e:
-        return f"[Error extracting PPTX (native mode): {e}]"
+        return f"[Error extracting PPTX (native mode): {e}]", {}
+
+
+# Compiled once; the EPUB/EML/RTF extractors run these per content chunk
+# and a string-pattern re.sub pays a cache lookup on every call.
+HTML_TAG_RE = re.compile(r'<[^>]+>')
+WHITESPACE_RE = re.compile(r'\s+')
+# Control words and group/escape characters in one alternation: a single
+# pass over the document instead of two.
+RTF_CTRL_RE = re.compile(r'\\[a-z]+-?\d*[ ]?|[{}\\]')
 
 
 def extract_epub(filepath):
     """Extract text from EPUB by reading HTML content files."""
     try:
-        import re
         parts = []
         with zipfile.ZipFile(filepath, 'r') as z:
-            opf_files = [f for f in z.namelist() if f.endswith('.opf')]
+            # namelist() rebuilds the list per call and membership checks
+            # against it are O(n); read it once and probe a set instead.
+            names = z.namelist()
+            name_set = set(names)
+            opf_files = [f for f in names if f.endswith('.opf')]
             spine_items = []
             if opf_files:
                 with z.open(opf_files[0]) as f:
@@ -376,18 +1118,18 @@ def extract_epub(filepath):
                         if idref in manifest:
                             spine_items.append(manifest[idref])
             if not spine_items:
-                spine_items = [f for f in z.namelist() if f.endswith(('.html', '.xhtml', '.htm'))]
+                spine_items = [f for f in names if f.endswith(('.html', '.xhtml', '.htm'))]
             base = (os.path.dirname(opf_files[0]) + '/') if opf_files else ''
             for item in spine_items[:50]:
                 path = (base + item).lstrip('/')
-                if path not in z.namelist():
+                if path not in name_set:
                     path = item
-                if path not in z.namelist():
+                if path not in name_set:
                     continue
                 with z.open(path) as f:
                     content = f.read().decode('utf-8', errors='ignore')
-                text = re.sub(r'<[^>]+>', ' ', content)
-                text = re.sub(r'\s+', ' ', text).strip()
+                text = HTML_TAG_RE.sub(' ', content)
+                text = WHITESPACE_RE.sub(' ', text).strip()
                 if text:
                     parts.append(text)
         return "\n\n".join(parts) if parts else "[Empty EPUB]"
@@ -413,19 +1155,38 @@ def extract_zip(filepath):
 
 def extract_csv(filepath):
     try:
-        import csv
-        with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
-            reader = csv.reader(f)
-            rows = list(reader)
+        total = None
+        try:
+            # Fast path: pandas parses in C and stops after the rows we render
+            import pandas as pd
+            df = pd.read_csv(filepath, nrows=101, header=None, dtype=str,
+                             engine='c', keep_default_na=False)
+            rows = df.values.tolist()
+            if len(rows) > 100:
+                # More rows exist than we show; count raw lines for the footer
+                # (close enough unless quoted fields embed newlines)
+                with open(filepath, 'rb') as f:
+                    total = sum(1 for _ in f)
+        except Exception:
+            with open(filepath, 'r', encoding='utf-8', errors='ignore',
+                      newline='') as f:
+                reader = csv.reader(f)
+                # Only the first 101 rows are rendered; stream them and count
+                # the remainder so a multi-GB CSV never lives in memory.
+                rows = list(itertools.islice(reader, 101))
+                if len(rows) > 100:
+                    total = len(rows) + sum(1 for _ in reader)
         if not rows:
             return "(Empty CSV)"
+        if total is None:
+            total = len(rows)
         header = rows[0]
         lines = ["| " + " | ".join(header) + " |",
                  "| " + " | ".join(["---"] * len(header)) + " |"]
         for row in rows[1:101]:  # cap at 100 rows
             lines.append("| " + " | ".join(str(c) for c in row) + " |")
-        if len(rows) > 101:
-            lines.append(f"\n*({len(rows) - 1} rows total, showing first 100)*")
+        if total > 101:
+            lines.append(f"\n*({total - 1} rows total, showing first 100)*")
         return "\n".join(lines)
     except Exception as e:
         return f"[Error extracting CSV: {e}]"
@@ -456,66 +1217,103 @@ def extract_ipynb(filepath):
         return f"[Error extracting notebook: {e}]"
 
 
+def ocr_frame(frame):
+    """OCR one video frame; returns its lines (>2 chars, stripped)."""
+    try:
+        r = subprocess.run(['tesseract', str(frame), 'stdout', '-l', 'chi_sim+eng'], capture_output=True, text=True)
+        if r.returncode == 0:
+            return [l.strip() for l in r.stdout.split("\n") if len(l.strip()) > 2]
+    except Exception:
+        pass
+    return []
+
+
 def extract_media_metadata(filepath, mime_type):
     """Extract duration, format info, and process Video/Audio based on FAR_VIDEO_MODE."""
     mode = os.environ.get("FAR_VIDEO_MODE", "A").upper()
     if mode == "ALL": mode = "D"
     
     parts = []
-    
-    # 1. Base ffprobe metadata
+
+    # Kick off the transcription pipeline (ffmpeg transcode + Whisper upload)
+    # first so the ffprobe pass below overlaps it instead of delaying it.
+    transcribe_future = None
+    transcribe_pool = None
+    if mode in ["B", "D"] or mime_type.startswith('audio/'):
+        transcribe_pool = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        transcribe_future = transcribe_pool.submit(openai_transcribe, filepath)
+
+    # 1. Base ffprobe metadata — one JSON invocation gives both the fields
+    # we render and the duration used to tune frame sampling below.
     local_info = ""
-    import shutil
+    duration = 0.0
     try:
-        if not os.path.exists(FFPROBE_BIN) and shutil.which('ffprobe') is None:
+        ffprobe = tool_path('ffprobe')
+        if ffprobe is None:
              local_info = "[ffprobe not found]"
         else:
-            cmd = [FFPROBE_BIN, '-v', 'error', '-show_entries', 'format=duration,size,bit_rate:stream=codec_name,width,height', '-of', 'default=noprint_wrappers=1:nokey=1', filepath]
-            if not os.path.exists(FFPROBE_BIN): cmd[0] = 'ffprobe'
+            cmd = [ffprobe, '-v', 'error', '-show_format', '-show_streams', '-print_format', 'json', filepath]
 
             result = subprocess.run(cmd, capture_output=True, text=True)
             if result.returncode == 0:
-                local_info = f"Media Info (ffprobe):\n{result.stdout}"
+                probe = json.loads(result.stdout or '{}')
+                fmt = probe.get('format', {})
+                try:
+                    duration = float(fmt.get('duration') or 0)
+                except ValueError:
+                    duration = 0.0
+                info_lines = [f"{k}: {fmt[k]}" for k in ('duration', 'size', 'bit_rate') if fmt.get(k)]
+                for s in probe.get('streams', []):
+                    desc = s.get('codec_name', '?')
+                    if s.get('width'):
+                        desc += f" {s.get('width')}x{s.get('height')}"
+                    info_lines.append(f"stream: {desc}")
+                local_info = "Media Info (ffprobe):\n" + "\n".join(info_lines)
     except Exception as e:
         local_info = f"[Media extraction error: {e}]"
     parts.append(local_info)
 
     # 2. Audio Processing (Option B) - Applies to both audio/video files
-    if mode in ["B", "D"] or mime_type.startswith('audio/'):
-        ai_transcript = openai_transcribe(filepath)
+    if transcribe_future is not None:
+        ai_transcript = transcribe_future.result()
+        transcribe_pool.shutdown()
         if ai_transcript:
             parts.append(f"## Audio Transcript (Option B)\n{ai_transcript}")
 
     # 3. Video Processing (Option A & C)
     if mime_type.startswith('video/') and mode in ["A", "C", "D"]:
-        import tempfile
         try:
             with tempfile.TemporaryDirectory() as tmpdir:
-                # Extract 1 frame per 3 seconds (max 20 frames to avoid hanging)
-                cmd = [FFMPEG_BIN if os.path.exists(FFMPEG_BIN) else 'ffmpeg', '-y', '-i', filepath, '-vf', 'fps=1/3', '-vframes', '20', os.path.join(tmpdir, 'frame_%04d.png')]
+                # Spread the 20-frame budget over the whole clip: 1 frame
+                # per 3s for short videos, proportionally sparser for long
+                # ones instead of only covering the first minute.
+                interval = max(3, int(duration / 20)) if duration else 3
+                # -threads 2: frame sampling is I/O-bound; don't let ffmpeg
+                # grab every core while the OCR pool below is also running
+                cmd = [tool_path('ffmpeg') or 'ffmpeg', '-y', '-threads', '2', '-i', filepath, '-vf', f'fps=1/{interval}', '-vframes', '20', os.path.join(tmpdir, 'frame_%04d.png')]
                 subprocess.run(cmd, capture_output=True)
                 
                 frames = sorted(Path(tmpdir).glob('*.png'))
                 if frames:
                     # Option A: Local OCR (Default)
                     if mode in ["A", "D"]:
+                        # OCR frames concurrently (tesseract is a separate
+                        # single-threaded process per frame), then dedupe in
+                        # frame order so repeated overlays collapse as before.
+                        ocr_workers = int(os.environ.get("FAR_OCR_WORKERS") or
+                                          max(1, (os.cpu_count() or 2) // 2))
+                        with concurrent.futures.ThreadPoolExecutor(max_workers=ocr_workers) as ocr_pool:
+                            frame_lines = list(ocr_pool.map(ocr_frame, frames))
                         ocr_texts = []
                         seen_lines = set()
-                        for f in frames:
-                            try:
-                                r = subprocess.run(['tesseract', str(f), 'stdout', '-l', 'chi_sim+eng'], capture_output=True, text=True)
-                                if r.returncode == 0:
-                                    text = r.stdout.strip()
-                                    lines = [l.strip() for l in text.split("\n") if len(l.strip()) > 2]
-                                    new_lines = []
-                                    for l in lines:
-                                        if l not in seen_lines:
-                                            seen_lines.add(l)
-                                            new_lines.append(l)
-                                    if new_lines:
-                                        ocr_texts.append("\n".join(new_lines))
-                            except Exception:
-                                pass
+                        for lines in frame_lines:
+                            new_lines = []
+                            for l in lines:
+                                if l not in seen_lines:
+                                    seen_lines.add(l)
+                                    new_lines.append(l)
+                            if new_lines:
+                                ocr_texts.append("\n".join(new_lines))
                         if ocr_texts:
                             parts.append("## Video Frame OCR (Option A)\n" + "\n...\n".join(ocr_texts))
                     
@@ -524,12 +1322,19 @@ def extract_media_metadata(filepath, mime_type):
                         api_key = get_openai_key()
                         if api_key:
                             selected_frames = frames[::max(1, len(frames)//5)][:5] # Up to 5 evenly spaced frames
-                            images_content = []
-                            for f in selected_frames:
-                                with open(f, "rb") as image_file:
-                                    base64_image = base64.b64encode(image_file.read()).decode('utf-8')
-                                images_content.append({"type": "image_url", "image_url": {"url": f"data:image/png;base64,{base64_image}"}})
-                                
+
+                            def encode_frame(frame):
+                                return prepare_vision_image(str(frame))
+
+                            # Read + encode the frames concurrently; b64encode
+                            # releases the GIL and the reads overlap
+                            with concurrent.futures.ThreadPoolExecutor(max_workers=len(selected_frames)) as enc_pool:
+                                encoded_frames = list(enc_pool.map(encode_frame, selected_frames))
+                            images_content = [
+                                {"type": "image_url", "image_url": {"url": f"data:image/{subtype};base64,{b64}", "detail": "low"}}
+                                for b64, subtype in encoded_frames
+                            ]
+
                             try:
                                 headers = {"Content-Type": "application/json", "Authorization": f"Bearer {api_key}"}
                                 payload = {
@@ -537,13 +1342,9 @@ def extract_media_metadata(filepath, mime_type):
                                     "messages": [{"role": "user", "content": [{"type": "text", "text": "Describe the sequence of events and any text visible in these video frames."}] + images_content}],
                                     "max_tokens": 1000
                                 }
-                                import urllib.request
-                                import json
-                                req = urllib.request.Request(f"{get_openai_base()}/chat/completions", data=json.dumps(payload).encode('utf-8'), headers=headers)
-                                with urllib.request.urlopen(req) as response:
-                                    res = json.load(response)
-                                    content_vision = res['choices'][0]['message']['content']
-                                    parts.append(f"## AI Vision Summary (Option C)\n{content_vision}")
+                                res = openai_request(f"{get_openai_base()}/chat/completions", data=json.dumps(payload).encode('utf-8'), headers=headers)
+                                content_vision = res['choices'][0]['message']['content']
+                                parts.append(f"## AI Vision Summary (Option C)\n{content_vision}")
                             except Exception as e:
                                 parts.append(f"[AI Vision Error: {e}]")
         except Exception as e:
@@ -552,19 +1353,29 @@ def extract_media_metadata(filepath, mime_type):
     return "\n\n".join(parts)
 
     
-def extract_image_ocr(filepath):
-    """Extract text from image using tesseract (local) + AI Vision (optional)."""
-    local_ocr = ""
+def local_image_ocr(filepath):
+    """Extract text from image using tesseract only (no API calls)."""
+    if tool_path('tesseract') is None:
+        return "[Error: tesseract not installed]"
     try:
-        subprocess.run(['tesseract', '--version'], capture_output=True, check=False)
         result = subprocess.run(['tesseract', filepath, '-', '-l', 'eng+chi_sim'], capture_output=True, text=True)
         if result.returncode == 0:
-             local_ocr = f"[Local OCR]:\n{result.stdout}"
+            return f"[Local OCR]:\n{result.stdout}"
+        return ""
     except FileNotFoundError:
-        local_ocr = "[Error: tesseract not installed]"
+        return "[Error: tesseract not installed]"
+
 
-    # AI Enhancement
-    ai_vision = openai_vision(filepath)
+def extract_image_ocr(filepath):
+    """Extract text from image using tesseract (local) + AI Vision (optional).
+
+    The vision request runs on a worker thread while tesseract OCRs locally,
+    so per-image wall time is max(OCR, API) instead of the sum.
+    """
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as pool:
+        ai_future = pool.submit(openai_vision, filepath)
+        local_ocr = local_image_ocr(filepath)
+        ai_vision = ai_future.result()
     if ai_vision:
         return f"{local_ocr}\n\n{ai_vision}"
     return local_ocr
@@ -573,15 +1384,19 @@ def extract_image_ocr(filepath):
 def extract_tar(filepath):
     """List contents of a tar/tar.gz/tar.bz2 archive."""
     try:
-        import tarfile
         with tarfile.open(filepath, 'r:*') as t:
-            members = t.getmembers()
-            lines = [f"## Archive Contents ({len(members)} entries)\n"]
-            for m in members[:200]:
-                size = f"{m.size:,} bytes" if m.isfile() else "dir"
-                lines.append(f"- `{m.name}` ({size})")
-            if len(members) > 200:
-                lines.append(f"\n*({len(members)} total, showing first 200)*")
+            # Iterating the TarFile streams one header at a time;
+            # getmembers() scans the whole archive and keeps every TarInfo.
+            entries = []
+            total = 0
+            for m in t:
+                total += 1
+                if total <= 200:
+                    size = f"{m.size:,} bytes" if m.isfile() else "dir"
+                    entries.append(f"- `{m.name}` ({size})")
+            lines = [f"## Archive Contents ({total} entries)\n"] + entries
+            if total > 200:
+                lines.append(f"\n*({total} total, showing first 200)*")
             return "\n".join(lines)
     except Exception as e:
         return f"[Error reading archive: {e}]"
@@ -590,7 +1405,6 @@ def extract_tar(filepath):
 def extract_eml(filepath):
     """Extract email content: headers + body + attachment list."""
     try:
-        import email
         with open(filepath, 'rb') as f:
             msg = email.message_from_bytes(f.read())
         parts = []
@@ -612,9 +1426,8 @@ def extract_eml(filepath):
             elif ct == 'text/html' and 'attachment' not in cd:
                 payload = part.get_payload(decode=True)
                 if payload:
-                    import re
-                    text = re.sub(r'<[^>]+>', ' ', payload.decode('utf-8', errors='ignore'))
-                    text = re.sub(r'\s+', ' ', text).strip()
+                    text = HTML_TAG_RE.sub(' ', payload.decode('utf-8', errors='ignore'))
+                    text = WHITESPACE_RE.sub(' ', text).strip()
                     parts.append(text)
         if attachments:
             parts.append(f"\n**Attachments:** {', '.join(attachments)}")
@@ -626,23 +1439,25 @@ def extract_eml(filepath):
 def extract_rtf(filepath):
     """Extract plain text from RTF by stripping control words."""
     try:
-        import re
         with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
             content = f.read()
         # Remove RTF control words and groups
-        text = re.sub(r'\\[a-z]+[-]?\d*[ ]?', '', content)
-        text = re.sub(r'[{}\\]', '', text)
-        text = re.sub(r'\s+', ' ', text).strip()
+        text = RTF_CTRL_RE.sub('', content)
+        text = WHITESPACE_RE.sub(' ', text).strip()
         return text
     except Exception as e:
         return f"[Error extracting RTF: {e}]"
 
 
+def _cell(v):
+    """Render one SQLite value for a markdown table cell."""
+    return "" if v is None else str(v)
+
+
 def extract_sqlite(filepath):
     """Extract table schemas and recent rows from SQLite (up to 20 rows per table)."""
     MAX_ROWS = 20
     try:
-        import sqlite3
         con = sqlite3.connect(filepath)
         cur = con.cursor()
         cur.execute("SELECT name FROM sqlite_master WHERE type='table' ORDER BY name")
@@ -658,15 +1473,18 @@ def extract_sqlite(filepath):
                 count = cur.fetchone()[0]
                 parts.append(f"### {table} ({count:,} rows)\n**Schema:** " + ", ".join(col_types))
                 # Fetch most recent rows by rowid desc
+                cur.arraysize = MAX_ROWS
                 cur.execute(f"SELECT * FROM `{table}` ORDER BY rowid DESC LIMIT {MAX_ROWS}")
-                rows = cur.fetchall()
+                rows = cur.fetchmany(MAX_ROWS)
                 if rows:
                     header = "| " + " | ".join(cols) + " |"
                     sep = "| " + " | ".join(["---"] * len(cols)) + " |"
-                    lines = [header, sep]
-                    for row in reversed(rows):  # show oldest-first within the sample
-                        lines.append("| " + " | ".join(str(v) if v is not None else "" for v in row) + " |")
-                    parts.append("\n".join(lines))
+                    # oldest-first within the sample; map(_cell, ...) keeps
+                    # the inner loop in C for wide tables
+                    body = "\n".join(
+                        "| " + " | ".join(map(_cell, row)) + " |"
+                        for row in reversed(rows))
+                    parts.append(header + "\n" + sep + "\n" + body)
                     if count > MAX_ROWS:
                         parts.append(f"*({count:,} rows total, showing latest {MAX_ROWS})*")
             except Exception as ex:
@@ -680,8 +1498,6 @@ def extract_sqlite(filepath):
 def extract_parquet(filepath):
     """[Metadata only] Extract schema and row count from Parquet file."""
     try:
-        import struct
-        # Read Parquet footer magic to confirm format, then use pyarrow if available
         try:
             import pyarrow.parquet as pq
             pf = pq.read_metadata(filepath)
@@ -707,158 +1523,349 @@ def extract_design_metadata(filepath):
         ext = Path(filepath).suffix.lower()
         name = Path(filepath).name
         size_kb = stat.st_size / 1024
-        # .sketch and .fig are zip-based, try to list internal structure
+        # Listing the archive means a full central-directory parse for a
+        # "metadata only" answer; by default a 4-byte peek just tells
+        # zip-based containers apart from opaque binaries. FAR_DESIGN_DEEP=1
+        # restores the entry/page listing.
         try:
-            with zipfile.ZipFile(filepath, 'r') as z:
-                entries = z.namelist()
-                pages = [e for e in entries if 'page' in e.lower() or 'canvas' in e.lower()]
-                parts = [
-                    f"## {name}",
-                    f"**Format:** {ext[1:].upper()}  **Size:** {size_kb:.1f} KB",
-                    f"**Internal files:** {len(entries)}",
-                ]
-                if pages:
-                    parts.append(f"**Pages/Canvases:** {len(pages)}")
-                parts.append("\n> [Metadata only] — design content requires native app to render.")
-                return "\n\n".join(parts)
-        except Exception:
-            return (f"## {name}\n\n**Format:** {ext[1:].upper()}  **Size:** {size_kb:.1f} KB"
-                    "\n\n> [Metadata only] — design content requires native app to render.")
+            with open(filepath, 'rb') as f:
+                is_zip = f.read(4) == b'PK\x03\x04'
+        except OSError:
+            is_zip = False
+        if is_zip and os.environ.get("FAR_DESIGN_DEEP") == "1":
+            try:
+                with zipfile.ZipFile(filepath, 'r') as z:
+                    entries = z.namelist()
+                    pages = [e for e in entries if 'page' in e.lower() or 'canvas' in e.lower()]
+                    parts = [
+                        f"## {name}",
+                        f"**Format:** {ext[1:].upper()}  **Size:** {size_kb:.1f} KB",
+                        f"**Internal files:** {len(entries)}",
+                    ]
+                    if pages:
+                        parts.append(f"**Pages/Canvases:** {len(pages)}")
+                    parts.append("\n> [Metadata only] — design content requires native app to render.")
+                    return "\n\n".join(parts)
+            except Exception:
+                pass
+        container = "  **Container:** ZIP" if is_zip else ""
+        return (f"## {name}\n\n**Format:** {ext[1:].upper()}  **Size:** {size_kb:.1f} KB{container}"
+                "\n\n> [Metadata only] — design content requires native app to render.")
     except Exception as e:
         return f"[Error reading design file: {e}]"
 
 
 # --- Ignorer ---
 
+@functools.lru_cache(maxsize=32)
+def parse_farignore(ignore_path, mtime):
+    """Parse one .farignore; the mtime key invalidates the cache on edits."""
+    patterns = []
+    with open(ignore_path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                patterns.append(line)
+    return tuple(patterns)
+
 def load_farignore(root_dir):
     ignore_patterns = ['.git', '.meta', '.DS_Store', 'node_modules']
     ignore_path = os.path.join(root_dir, '.farignore')
-    if os.path.exists(ignore_path):
-        with open(ignore_path, 'r') as f:
-            for line in f:
-                line = line.strip()
-                if line and not line.startswith('#'):
-                    ignore_patterns.append(line)
+    try:
+        mtime = os.stat(ignore_path).st_mtime
+    except OSError:
+        return ignore_patterns
+    ignore_patterns.extend(parse_farignore(ignore_path, mtime))
     return ignore_patterns
 
+@functools.lru_cache(maxsize=32)
+def compile_ignore(patterns):
+    """Compile an ignore-pattern tuple into a literal set + two regexes.
+
+    Plain names without glob characters (.git, node_modules, secrets/) go
+    in a set checked against path components in O(1); everything else is
+    folded into two alternation regexes — one against the whole relative
+    path (glob and glob/* forms), one against individual components. A set
+    probe plus at most one compiled scan replaces O(patterns x components)
+    fnmatch calls per checked path.
+    """
+    literals = set()
+    full = []
+    comp = []
+    for pattern in patterns:
+        p = pattern.rstrip('/')
+        if '/' not in p and not any(ch in p for ch in '*?['):
+            literals.add(p)
+            continue
+        full.append(fnmatch.translate(pattern))
+        full.append(fnmatch.translate(p + '/*'))
+        comp.append(fnmatch.translate(p))
+    full_re = re.compile('|'.join(full)) if full else None
+    comp_re = re.compile('|'.join(comp)) if comp else None
+    return literals, full_re, comp_re
+
 def should_ignore(path, root_dir, ignore_patterns):
-    import fnmatch
-    rel_path = os.path.relpath(path, root_dir).replace(os.sep, '/')
+    literals, full_re, comp_re = compile_ignore(tuple(ignore_patterns))
+    if not literals and full_re is None:
+        return False
+    # Walk paths are already prefixed by root_dir, so a plain slice replaces
+    # os.path.relpath (which runs getcwd + normpath twice per call).
+    if path.startswith(root_dir):
+        rel_path = path[len(root_dir):].lstrip(os.sep).replace(os.sep, '/')
+    else:
+        rel_path = os.path.relpath(path, root_dir).replace(os.sep, '/')
     parts = rel_path.split('/')
-    for pattern in ignore_patterns:
-        p = pattern.rstrip('/')
-        # Match any path component
-        if p in parts:
-            return True
-        # Full glob match
-        if fnmatch.fnmatch(rel_path, pattern) or fnmatch.fnmatch(rel_path, pattern.rstrip('/') + '/*'):
-            return True
-        # Match each component
-        for part in parts:
-            if fnmatch.fnmatch(part, p):
-                return True
-    return False
+    if literals and not literals.isdisjoint(parts):
+        return True
+    if full_re is None:
+        return False
+    if full_re.match(rel_path):
+        return True
+    return any(comp_re.match(part) for part in parts)
 
 # --- Generators ---
 
-def generate_file_meta(filepath, root_dir, ignore_patterns, force=False):
-    if should_ignore(filepath, root_dir, ignore_patterns):
+META_HEAD_BYTES = 4096  # frontmatter plus enough body for directory snippets
+MAX_META_BODY = 2 * 1024 * 1024  # chars; LLM consumers never need more body
+
+# Frontmatter rendered once per file via a shared %-template: the static text
+# (and the constant PIPELINE_ID) is baked in at import instead of being
+# re-assembled from f-string pieces on every write.
+_META_TEMPLATE = (
+    "--far_version: 1\n"
+    "source:\n"
+    "  %s\n"
+    "  mime: %s\n"
+    "  size: %d\n"
+    "  mtime: %s\n"
+    "extract:\n"
+    "  pipeline: " + PIPELINE_ID + "\n"
+    "  extracted_at: %s\n"
+    "  deterministic: true\n"
+    "%s---\n"
+    "# %s\n\n")
+
+# In-process index of .meta heads. Every sidecar written this scan is read
+# back moments later by generate_dir_meta; serving those from memory avoids
+# one open+read per file.
+_META_HEAD_CACHE = {}
+
+def cache_meta_head(meta_path, content):
+    _META_HEAD_CACHE[str(meta_path)] = content[:META_HEAD_BYTES]
+
+def read_meta_head(meta_path):
+    """First few KB of a .meta file, from the in-process index if possible."""
+    key = str(meta_path)
+    head = _META_HEAD_CACHE.get(key)
+    if head is None:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            head = f.read(META_HEAD_BYTES)
+        _META_HEAD_CACHE[key] = head
+    return head
+
+def write_text_file(path, content):
+    """Write a sidecar atomically with a single gathered write.
+
+    Accepts a str or a sequence of str pieces. Pieces are encoded
+    individually and handed to os.writev in one syscall, so a multi-MB
+    extracted body is never concatenated into a second giant string on
+    top of the buffered text layer's own copy.
+
+    The write lands in a sibling .tmp file that is os.replace()d over the
+    target, so a crash mid-write can never leave a truncated sidecar whose
+    frontmatter still passes the cache check. No fsync: on power loss the
+    torn temp file is simply orphaned and re-extraction is acceptable.
+    """
+    if isinstance(content, str):
+        content = (content,)
+    bufs = [memoryview(piece.encode('utf-8')) for piece in content]
+    tmp_path = str(path) + '.tmp'
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        while bufs:
+            written = os.writev(fd, bufs)
+            while bufs and written >= len(bufs[0]):
+                written -= len(bufs[0])
+                bufs.pop(0)
+            if bufs and written:
+                bufs[0] = bufs[0][written:]
+        os.close(fd)
+        fd = -1
+        os.replace(tmp_path, str(path))
+    except BaseException:
+        if fd != -1:
+            os.close(fd)
+        try: os.remove(tmp_path)
+        except OSError: pass
+        raise
+
+def parse_meta_head(meta_path):
+    """Frontmatter of a .meta sidecar as a flat {key: value} dict.
+
+    Reads only the head of the file straight from disk (cache checks must
+    see external edits, so the in-process index is bypassed) and never
+    touches the extracted body. Returns None when the sidecar is missing
+    or has no frontmatter terminator.
+    """
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            head = f.read(META_HEAD_BYTES)
+    except OSError:
         return None
+    end = head.find('\n---\n')
+    if end == -1:
+        return None
+    # Refresh the head index while we have the bytes; generate_dir_meta
+    # reads the same head for snippets on cache-hit runs.
+    _META_HEAD_CACHE[str(meta_path)] = head
+    fields = {}
+    for line in head[:end].splitlines():
+        key, sep, value = line.partition(':')
+        if sep:
+            fields[key.strip()] = value.strip()
+    return fields
+
+def write_meta(filepath, extracted_text, layout=None, current_hash=None, mime_type=None, stat=None):
+    """Write the .meta sidecar for a file with the given extracted body."""
+    meta_path = str(filepath) + ".meta"
+    if stat is None:
+        stat = os.stat(filepath)
+    if current_hash is None:
+        current_hash = get_sha256(filepath)
+    if mime_type is None:
+        mime_type = get_mime_type(filepath)
 
-    file_path = Path(filepath)
-    meta_path = file_path.with_suffix(file_path.suffix + ".meta")
-    
-    # 1. Fast Check: Mtime & Size
+    timestamp = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    layout_yaml = ""
+    if layout:
+        layout_yaml = "layout:\n" + "".join(f"  {k}: {v}\n" for k, v in layout.items())
+    if len(extracted_text) > MAX_META_BODY:
+        omitted = len(extracted_text) - MAX_META_BODY
+        extracted_text = (extracted_text[:MAX_META_BODY]
+                          + f"\n\n[... truncated {omitted:,} characters]")
+    header = _META_TEMPLATE % (
+        hash_field(current_hash), mime_type, stat.st_size, stat.st_mtime,
+        timestamp, layout_yaml, os.path.basename(filepath))
+    # header and body go down as separate iovecs; no combined copy is built
+    write_text_file(meta_path, (header, extracted_text, "\n"))
+    cache_meta_head(meta_path, header + extracted_text[:META_HEAD_BYTES])
+
+    log(f"Generated meta: {meta_path}", "DEBUG")
+    return meta_path
+
+def meta_is_current(filepath, meta_path):
+    """Fast cache check: .meta exists and matches the source mtime/size + pipeline."""
     try:
         stat = os.stat(filepath)
+    except OSError:
+        return False
+    fields = parse_meta_head(meta_path)
+    return bool(fields
+                and fields.get('mtime') == str(stat.st_mtime)
+                and fields.get('size') == str(stat.st_size)
+                and fields.get('pipeline') == PIPELINE_ID)
+
+# O(1) extension dispatch for generate_file_meta, replacing a ~15-branch
+# elif ladder in the hottest function. Values are attribute names resolved
+# at call time so extractors stay swappable at runtime.
+EXTRACTOR_BY_EXT = {
+    '.pdf': 'extract_pdf',
+    '.docx': 'extract_docx',
+    '.doc': 'extract_doc',
+    '.xlsx': 'extract_xlsx',
+    '.pptx': 'extract_pptx',
+    '.csv': 'extract_csv',
+    '.ipynb': 'extract_ipynb',
+    '.epub': 'extract_epub',
+    '.zip': 'extract_zip', '.jar': 'extract_zip',
+    '.whl': 'extract_zip', '.apk': 'extract_zip',
+    '.tar': 'extract_tar', '.gz': 'extract_tar', '.bz2': 'extract_tar',
+    '.xz': 'extract_tar', '.tgz': 'extract_tar',
+    '.eml': 'extract_eml', '.msg': 'extract_eml',
+    '.rtf': 'extract_rtf',
+    '.db': 'extract_sqlite', '.sqlite': 'extract_sqlite',
+    '.sqlite3': 'extract_sqlite',
+    '.parquet': 'extract_parquet',
+    '.fig': 'extract_design_metadata', '.sketch': 'extract_design_metadata',
+    '.xd': 'extract_design_metadata',
+}
+
+def unpack_extract(result):
+    """Normalize a layout-aware extractor result to (text, layout).
+
+    The PDF/XLSX/PPTX extractors return their layout counts alongside the
+    text so the caller never re-opens the document; a bare string (e.g.
+    from a replacement extractor) still works.
+    """
+    return result if isinstance(result, tuple) else (result, {})
+
+def refresh_meta_mtime(meta_path, current_mtime):
+    """Rewrite just the mtime line of an otherwise up-to-date sidecar."""
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            content = f.read()
+        updated = content.replace(
+            next(l for l in content.splitlines() if l.strip().startswith('mtime:')),
+            f"  mtime: {current_mtime}"
+        )
+        write_text_file(meta_path, updated)
+        cache_meta_head(meta_path, updated)
+        return True
+    except Exception:
+        return False
+
+def generate_file_meta(filepath, root_dir, ignore_patterns, force=False, stat=None):
+    if should_ignore(filepath, root_dir, ignore_patterns):
+        return None
+
+    # Plain string ops here: Path construction and .with_suffix re-parse the
+    # path per call, and this runs for every file on every scan.
+    filepath = str(filepath)
+    meta_path = filepath + ".meta"
+
+    # 1. Fast Check: Mtime & Size (stat may come cached from the scandir walk)
+    try:
+        if stat is None:
+            stat = os.stat(filepath)
         current_mtime = stat.st_mtime
         current_size = stat.st_size
     except FileNotFoundError:
         log(f"Error: File not found {filepath}", "ERROR")
         return None
 
-    if not force and meta_path.exists():
-        try:
-            with open(meta_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            if (f"mtime: {current_mtime}" in content
-                    and f"size: {current_size}" in content
-                    and f"pipeline: {PIPELINE_ID}" in content):
-                return meta_path
-        except Exception:
-            pass
+    meta_fields = None if force else parse_meta_head(meta_path)
+    if (meta_fields
+            and meta_fields.get('mtime') == str(current_mtime)
+            and meta_fields.get('size') == str(current_size)
+            and meta_fields.get('pipeline') == PIPELINE_ID):
+        return meta_path
 
-    # 2. Slow Check: SHA256 (if mtime/size/pipeline changed)
+    # 2. Slow Check: SHA256 (if the stat fast path missed)
     current_hash = get_sha256(filepath)
     if not current_hash:
         log(f"Error: Cannot hash {filepath}", "ERROR")
         return None
 
     # Check SHA256 even if mtime changed (content may be same)
-    if not force and meta_path.exists():
-        try:
-            with open(meta_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            if (f"sha256: {current_hash}" in content
-                    and f"pipeline: {PIPELINE_ID}" in content):
-                # Content unchanged, just update mtime in meta
-                updated = content.replace(
-                    next(l for l in content.splitlines() if l.strip().startswith('mtime:')),
-                    f"  mtime: {current_mtime}"
-                )
-                with open(meta_path, 'w', encoding='utf-8') as f:
-                    f.write(updated)
-                return meta_path
-        except Exception:
-            pass
+    hash_key, _, hash_value = hash_field(current_hash).partition(': ')
+    if (meta_fields
+            and meta_fields.get(hash_key) == hash_value
+            and meta_fields.get('pipeline') == PIPELINE_ID):
+        # Content unchanged, just update mtime in meta
+        if refresh_meta_mtime(meta_path, current_mtime):
+            return meta_path
 
     # Extract
     log(f"Processing: {filepath} ({current_hash[:8]}...)")
     mime_type = get_mime_type(filepath)
-    ext = file_path.suffix.lower()
+    ext = os.path.splitext(filepath)[1].lower()
     extracted_text = ""
     layout = {}
-    start_time = datetime.datetime.now()
+    start_time = time.perf_counter()
 
-    if ext == '.pdf':
-        extracted_text = extract_pdf(filepath)
-        # Count pages
-        try:
-            r = subprocess.run(['pdfinfo', filepath], capture_output=True, text=True)
-            for line in r.stdout.splitlines():
-                if line.startswith('Pages:'):
-                    layout['pages'] = int(line.split(':')[1].strip())
-        except Exception:
-            pass
-    elif ext == '.docx': extracted_text = extract_docx(filepath)
-    elif ext == '.doc': extracted_text = extract_doc(filepath)
-    elif ext == '.xlsx':
-        extracted_text = extract_xlsx(filepath)
-        # Count sheets
-        try:
-            with zipfile.ZipFile(filepath, 'r') as z:
-                sheets = [f for f in z.namelist() if f.startswith('xl/worksheets/sheet') and f.endswith('.xml')]
-                layout['sheets'] = len(sheets)
-        except Exception:
-            pass
-    elif ext == '.pptx':
-        extracted_text = extract_pptx(filepath)
-        try:
-            with zipfile.ZipFile(filepath, 'r') as z:
-                slides = [f for f in z.namelist() if f.startswith('ppt/slides/slide') and f.endswith('.xml')]
-                layout['slides'] = len(slides)
-        except Exception:
-            pass
-    elif ext == '.csv': extracted_text = extract_csv(filepath)
-    elif ext == '.ipynb': extracted_text = extract_ipynb(filepath)
-    elif ext == '.epub': extracted_text = extract_epub(filepath)
-    elif ext in ('.zip', '.jar', '.whl', '.apk'): extracted_text = extract_zip(filepath)
-    elif ext in ('.tar', '.gz', '.bz2', '.xz', '.tgz'): extracted_text = extract_tar(filepath)
-    elif ext in ('.eml', '.msg'): extracted_text = extract_eml(filepath)
-    elif ext == '.rtf': extracted_text = extract_rtf(filepath)
-    elif ext in ('.db', '.sqlite', '.sqlite3'): extracted_text = extract_sqlite(filepath)
-    elif ext == '.parquet': extracted_text = extract_parquet(filepath)
-    elif ext in ('.fig', '.sketch', '.xd'): extracted_text = extract_design_metadata(filepath)
+    handler_name = EXTRACTOR_BY_EXT.get(ext)
+    if handler_name:
+        extracted_text, layout = unpack_extract(globals()[handler_name](filepath))
     elif mime_type.startswith('image/'): extracted_text = extract_image_ocr(filepath)
     elif mime_type.startswith('video/') or mime_type.startswith('audio/'): extracted_text = extract_media_metadata(filepath, mime_type)
     elif mime_type.startswith('text/') or ext in ['.txt', '.md', '.json', '.yml', '.py', '.sh', '.meta', '.js', '.css', '.html', '.xml']:
@@ -869,37 +1876,23 @@ def generate_file_meta(filepath, root_dir, ignore_patterns, force=False):
     else:
         extracted_text = f"[Binary: {mime_type}]"
 
-    duration = (datetime.datetime.now() - start_time).total_seconds()
+    duration = time.perf_counter() - start_time
     log(f"Done: {filepath} (Time: {duration:.2f}s)")
 
+    return write_meta(filepath, extracted_text, layout, current_hash, mime_type, stat)
 
-    # Write .meta
-    timestamp = datetime.datetime.now(datetime.timezone.utc).isoformat()
-    layout_yaml = ""
-    if layout:
-        layout_yaml = "layout:\n" + "".join(f"  {k}: {v}\n" for k, v in layout.items())
-    meta_content = f"""--far_version: 1
-source:
-  sha256: {current_hash}
-  mime: {mime_type}
-  size: {current_size}
-  mtime: {current_mtime}
-extract:
-  pipeline: {PIPELINE_ID}
-  extracted_at: {timestamp}
-  deterministic: true
-{layout_yaml}---
-# {file_path.name}
+def dir_signature(candidates):
+    """Cheap stat-level fingerprint of a directory's direct files.
 
-{extracted_text}
-"""
-    with open(meta_path, 'w', encoding='utf-8') as f:
-        f.write(meta_content)
-    
-    log(f"Generated meta: {meta_path}", "DEBUG")
-    return meta_path
+    Hashes the sorted (name, mtime, size) tuples so an unchanged directory can
+    be recognized without touching any file content.
+    """
+    sig_src = "\n".join(
+        f"{entry.name}|{stat.st_mtime}|{stat.st_size}"
+        for entry, stat in sorted(candidates, key=lambda c: c[0].name))
+    return hashlib.sha256(sig_src.encode('utf-8')).hexdigest()
 
-def generate_dir_meta(dirpath, root_dir, ignore_patterns, files_in_dir):
+def generate_dir_meta(dirpath, root_dir, ignore_patterns, files_in_dir, signature=None):
     if should_ignore(dirpath, root_dir, ignore_patterns): return
 
     meta_path = os.path.join(dirpath, ".dir.meta")
@@ -917,41 +1910,98 @@ def generate_dir_meta(dirpath, root_dir, ignore_patterns, files_in_dir):
         
         snippet = ""
         try:
-            with open(f_meta_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-                parts = content.split('\n---\n')
-                if len(parts) >= 2:
-                    body = parts[-1].strip()
-                    lines = body.splitlines()
-                    if lines and lines[0].startswith('# '):
-                        body = "\n".join(lines[1:]).strip()
-                    clean_body = " ".join(body.split())[:150]
-                    if clean_body: snippet = clean_body + "..."
+            content = read_meta_head(f_meta_path)
+            # Single scan instead of split/splitlines/join passes: the head
+            # has exactly one '---' terminator, the body starts right after
+            # it, and the writer always emits a '# title' line first.
+            pos = content.find('\n---\n')
+            if pos != -1:
+                body_start = pos + 5
+                if content.startswith('# ', body_start):
+                    nl = content.find('\n', body_start)
+                    body_start = nl + 1 if nl != -1 else len(content)
+                clean_body = WHITESPACE_RE.sub(
+                    ' ', content[body_start:body_start + 600]).strip()[:150]
+                if clean_body: snippet = clean_body + "..."
         except: pass
         
         summary_lines.append(f"- **{file}**: {snippet}")
         count += 1
 
+    signature_yaml = f"dir_signature: {signature}\n" if signature else ""
     meta_content = f"""--far_version: 1
 type: directory
-extract:
+{signature_yaml}extract:
   pipeline: {PIPELINE_ID}
   extracted_at: {timestamp}
 ---
 {chr(10).join(summary_lines)}
 """
-    with open(meta_path, 'w', encoding='utf-8') as f:
-        f.write(meta_content)
+    # Skip the rewrite when only the timestamp would change (e.g. --force
+    # runs over an unchanged tree): same signature, same summary, no churn.
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            existing = f.read()
+    except OSError:
+        existing = None
+    strip_ts = functools.partial(re.sub, r'(?m)^  extracted_at: .*\n', '')
+    if existing is not None and strip_ts(existing) == strip_ts(meta_content):
+        cache_meta_head(meta_path, existing)
+        return
+
+    write_text_file(meta_path, meta_content)
+    cache_meta_head(meta_path, meta_content)
     log(f"Generated dir.meta: {meta_path}", "DEBUG")
 
+def walk_tree(top, root_dir=None, ignore_patterns=()):
+    """os.scandir-based bottom-up walk yielding (dirpath, subdir_names, file_entries).
+
+    Like os.walk(topdown=False), but files are yielded as DirEntry objects so
+    callers can reuse the cached stat() instead of re-statting every path.
+    When root_dir is given, ignored directories are pruned before descent —
+    a node_modules tree costs one should_ignore check instead of a full
+    walk that gets discarded afterwards.
+    """
+    subdirs = []
+    file_entries = []
+    try:
+        with os.scandir(top) as it:
+            for entry in it:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if is_dir:
+                    subdirs.append(entry)
+                else:
+                    file_entries.append(entry)
+    except (PermissionError, FileNotFoundError):
+        return
+    for sub in subdirs:
+        # os.walk(followlinks=False) semantics: symlinked dirs are listed
+        # with the subdirs but never descended into (or hashed as files).
+        if sub.is_symlink():
+            continue
+        if root_dir is not None and should_ignore(sub.path, root_dir, ignore_patterns):
+            continue
+        yield from walk_tree(sub.path, root_dir, ignore_patterns)
+    yield top, [s.name for s in subdirs], file_entries
+
 def main():
     parser = argparse.ArgumentParser(description="Generate .meta sidecar files for AI readability (FAR protocol).")
     parser.add_argument("path", nargs="?", default=".", help="Target directory or file to scan")
     parser.add_argument("--force", action="store_true", help="Force regenerate .meta files even if unchanged")
+    parser.add_argument("--workers", "--jobs", type=int, default=0, help="Parallel extraction workers (default: CPU count, 1 disables)")
+    parser.add_argument("--batch", action="store_true", help="Submit Vision work to the OpenAI Batch API (50%% cost, 24h turnaround)")
+    parser.add_argument("--collect-batches", action="store_true", help="Poll submitted batches and write completed .meta files")
     args = parser.parse_args()
-        
+
+    if args.collect_batches:
+        collect_batches()
+        return
+
     target_path = os.path.abspath(args.path)
-    
+
     # Handle single file case
     if os.path.isfile(target_path):
         root_dir = os.path.dirname(target_path)
@@ -964,36 +2014,82 @@ def main():
         sys.exit(1)
 
     ignore_patterns = load_farignore(target_path)
+
+    if args.batch:
+        submit_batch(target_path, ignore_patterns, force=args.force)
+        return
+
     log(f"FAR scanning: {target_path} (Ignore: {ignore_patterns})")
 
-    for root, dirs, files in os.walk(target_path, topdown=False):
+    # Extraction is dominated by subprocess and HTTP wait, so worker threads
+    # get real multi-core use out of the child processes without pickling.
+    workers = args.workers if args.workers > 0 else int(os.environ.get("FAR_WORKERS", 0))
+    if workers <= 0:
+        workers = min(32, os.cpu_count() or 4)
+    pool = concurrent.futures.ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+
+    def process_entry(item):
+        entry, entry_stat = item
+        return entry.name, generate_file_meta(entry.path, target_path, ignore_patterns, force=args.force, stat=entry_stat)
+
+    for root, dirs, file_entries in walk_tree(target_path, target_path, ignore_patterns):
         if should_ignore(root, target_path, ignore_patterns): continue
 
         processed_files = []
-        
+        file_names = {entry.name for entry in file_entries}
+
         # --- Cleanup orphaned .meta files ---
-        for file in files:
-            if file.endswith('.meta') and file != '.dir.meta':
-                original_file = file[:-5]
-                if original_file not in files:
-                    orphan_path = os.path.join(root, file)
+        for entry in file_entries:
+            if entry.name.endswith('.meta.tmp'):
+                # torn atomic write from a crashed run; never index it
+                try: os.remove(entry.path)
+                except OSError: pass
+                continue
+            if entry.name.endswith('.meta') and entry.name != '.dir.meta':
+                original_file = entry.name[:-5]
+                if original_file not in file_names:
                     try:
-                        os.remove(orphan_path)
-                        log(f"Cleaned up orphaned meta: {orphan_path}")
+                        os.remove(entry.path)
+                        log(f"Cleaned up orphaned meta: {entry.path}")
                     except Exception as e:
                         pass
         # ------------------------------------
 
-        for file in files:
-            if file.endswith('.meta') or file.startswith('.'): continue
-            
-            file_path = os.path.join(root, file)
-            meta_path = generate_file_meta(file_path, target_path, ignore_patterns, force=args.force)
-            if meta_path:
-                processed_files.append((file, meta_path))
-        
+        candidates = []
+        for entry in file_entries:
+            if entry.name.endswith(('.meta', '.meta.tmp')) or entry.name.startswith('.'): continue
+
+            try:
+                entry_stat = entry.stat()
+            except OSError:
+                entry_stat = None
+            candidates.append((entry, entry_stat))
+
+        # Stat-level directory signature: if nothing in this directory moved
+        # since the recorded .dir.meta, skip even the per-file cache checks.
+        signature = None
+        if candidates and all(stat is not None for _, stat in candidates):
+            signature = dir_signature(candidates)
+            if not args.force and all(f"{entry.name}.meta" in file_names for entry, _ in candidates):
+                try:
+                    head = read_meta_head(os.path.join(root, ".dir.meta"))
+                    if (f"dir_signature: {signature}" in head
+                            and f"pipeline: {PIPELINE_ID}" in head):
+                        continue
+                except Exception:
+                    pass
+
+        if pool is not None and len(candidates) > 1:
+            results = list(pool.map(process_entry, candidates))
+        else:
+            results = [process_entry(c) for c in candidates]
+        processed_files = [(name, meta_path) for name, meta_path in results if meta_path]
+
         if processed_files:
-            generate_dir_meta(root, target_path, ignore_patterns, processed_files)
+            generate_dir_meta(root, target_path, ignore_patterns, processed_files, signature)
+
+    if pool is not None:
+        pool.shutdown()
 
 if __name__ == "__main__":
     main()
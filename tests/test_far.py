@@ -41,11 +41,18 @@ class TestFarGen(unittest.TestCase):
         fixtures_dir = Path(__file__).parent / "fixtures"
         if not fixtures_dir.exists():
             self.skipTest("Fixtures directory not found")
-        
+
+        # Generated sidecars are build artifacts; don't leave them behind
+        # to dirty the checkout (their stat fields are machine-specific).
+        def _remove_meta(path):
+            if os.path.exists(path):
+                os.remove(path)
+
         # Test markdown file
         md_file = fixtures_dir / "sample.md"
         if md_file.exists():
             meta_path = self.far_gen.generate_file_meta(str(md_file), str(fixtures_dir), [])
+            self.addCleanup(_remove_meta, meta_path)
             self.assertTrue(os.path.exists(meta_path))
             with open(meta_path, "r") as f:
                 content = f.read()
@@ -55,6 +62,7 @@ class TestFarGen(unittest.TestCase):
         json_file = fixtures_dir / "sample.json"
         if json_file.exists():
             meta_path = self.far_gen.generate_file_meta(str(json_file), str(fixtures_dir), [])
+            self.addCleanup(_remove_meta, meta_path)
             self.assertTrue(os.path.exists(meta_path))
             with open(meta_path, "r") as f:
                 content = f.read()
@@ -64,6 +72,7 @@ class TestFarGen(unittest.TestCase):
         py_file = fixtures_dir / "sample.py"
         if py_file.exists():
             meta_path = self.far_gen.generate_file_meta(str(py_file), str(fixtures_dir), [])
+            self.addCleanup(_remove_meta, meta_path)
             self.assertTrue(os.path.exists(meta_path))
             with open(meta_path, "r") as f:
                 content = f.read()
@@ -0,0 +1,146 @@
+import unittest
+import os
+import shutil
+import sys
+import fnmatch
+import tempfile
+from pathlib import Path
+
+# Add the skill directory to path to import far_gen
+skill_dir = Path(__file__).parent.parent / "skills" / "far"
+sys.path.insert(0, str(skill_dir))
+import far_gen
+
+
+class TestSidecarWrites(unittest.TestCase):
+
+    def setUp(self):
+        self.d = tempfile.mkdtemp()
+        far_gen.log = lambda msg, level="INFO": None
+
+    def tearDown(self):
+        shutil.rmtree(self.d)
+
+    def test_write_text_file_atomic(self):
+        """The target appears whole and no .tmp sibling is left behind."""
+        p = os.path.join(self.d, "a.meta")
+        far_gen.write_text_file(p, ("head\n", "body"))
+        with open(p) as f:
+            self.assertEqual(f.read(), "head\nbody")
+        self.assertEqual([e for e in os.listdir(self.d) if e.endswith(".tmp")], [])
+
+    def test_write_text_file_failure_keeps_old_content(self):
+        """A failed write must not clobber the existing sidecar."""
+        p = os.path.join(self.d, "a.meta")
+        far_gen.write_text_file(p, "old")
+
+        def broken_writev(fd, bufs):
+            raise OSError("disk full")
+        original_writev = os.writev
+        os.writev = broken_writev
+        try:
+            with self.assertRaises(OSError):
+                far_gen.write_text_file(p, "new")
+        finally:
+            os.writev = original_writev
+
+        with open(p) as f:
+            self.assertEqual(f.read(), "old")
+        self.assertEqual([e for e in os.listdir(self.d) if e.endswith(".tmp")], [])
+
+    def test_meta_body_truncation(self):
+        """Bodies over MAX_META_BODY are capped with a truncation marker."""
+        p = os.path.join(self.d, "big.txt")
+        with open(p, "w") as f: f.write("x")
+        body = "y" * (far_gen.MAX_META_BODY + 1000)
+        meta_path = far_gen.write_meta(p, body)
+        # frontmatter + capped body + marker, never the full 2 MiB + 1000
+        self.assertLess(os.path.getsize(meta_path), far_gen.MAX_META_BODY + 4096)
+        with open(meta_path) as f:
+            content = f.read()
+        self.assertIn("[... truncated 1,000 characters]", content)
+
+
+class TestScanRuns(unittest.TestCase):
+    """End-to-end main() runs over a small tree."""
+
+    def setUp(self):
+        self.d = tempfile.mkdtemp()
+        far_gen.log = lambda msg, level="INFO": None
+
+    def tearDown(self):
+        shutil.rmtree(self.d)
+
+    def _run(self):
+        argv = sys.argv
+        sys.argv = ["far_gen.py", self.d, "--workers", "1"]
+        try:
+            far_gen.main()
+        finally:
+            sys.argv = argv
+
+    def test_stray_meta_tmp_removed(self):
+        """Torn .meta.tmp leftovers are deleted, not indexed."""
+        with open(os.path.join(self.d, "a.txt"), "w") as f: f.write("hello")
+        stray = os.path.join(self.d, "a.txt.meta.tmp")
+        with open(stray, "w") as f: f.write("torn write")
+
+        self._run()
+
+        self.assertFalse(os.path.exists(stray))
+        self.assertFalse(os.path.exists(stray + ".meta"))
+        self.assertTrue(os.path.exists(os.path.join(self.d, "a.txt.meta")))
+
+    def test_dir_signature_skips_warm_run(self):
+        """An unchanged directory skips even the per-file cache checks."""
+        with open(os.path.join(self.d, "a.txt"), "w") as f: f.write("hello")
+        self._run()
+
+        calls = []
+        original = far_gen.generate_file_meta
+        def counting(*args, **kwargs):
+            calls.append(args)
+            return original(*args, **kwargs)
+        far_gen.generate_file_meta = counting
+        try:
+            self._run()
+        finally:
+            far_gen.generate_file_meta = original
+
+        self.assertEqual(calls, [], "warm run should not reach generate_file_meta")
+
+
+class TestIgnoreEquivalence(unittest.TestCase):
+    """Compiled ignore matching agrees with the naive fnmatch loop."""
+
+    PATTERNS = ['.git', 'node_modules', '*.log', 'secrets/', 'build/**',
+                'docs/*.md', 'cache?']
+    REL_PATHS = ['a.txt', 'a.log', 'sub/deep/b.log', '.git', '.git/config',
+                 'node_modules/pkg/index.js', 'secrets', 'secrets/key.pem',
+                 'build/out/app.js', 'docs/readme.md', 'docs/sub/readme.md',
+                 'cache1/item', 'src/cache2', 'README.md', 'docsx/readme.md']
+
+    @staticmethod
+    def naive_ignore(rel_path, patterns):
+        parts = rel_path.split('/')
+        for pattern in patterns:
+            p = pattern.rstrip('/')
+            if p in parts:
+                return True
+            if (fnmatch.fnmatch(rel_path, pattern)
+                    or fnmatch.fnmatch(rel_path, p + '/*')):
+                return True
+            if any(fnmatch.fnmatch(part, p) for part in parts):
+                return True
+        return False
+
+    def test_matches_naive_reference(self):
+        root = "/scan/root"
+        for rel in self.REL_PATHS:
+            got = far_gen.should_ignore(f"{root}/{rel}", root, self.PATTERNS)
+            want = self.naive_ignore(rel, self.PATTERNS)
+            self.assertEqual(got, want, f"mismatch for {rel!r}")
+
+
+if __name__ == "__main__":
+    unittest.main()